@@ -1,5 +1,7 @@
 """
 ASGI config for friendmatch_backend project.
+
+Serves the REST API over HTTP and real-time messaging over WebSockets.
 """
 
 import os
@@ -8,5 +10,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'friendmatch_backend.settings')
 
-application = get_asgi_application()
+# Set up Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+
+from messaging.middleware import JWTAuthMiddleware
+from messaging.routing import websocket_urlpatterns
 
+# Sockets authenticate with bearer tokens, not cookies, so there is no
+# cross-site request forgery to guard against with an origin check
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -19,6 +19,7 @@ ALLOWED_HOSTS = []
 
 # Application definition
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -65,12 +66,28 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'friendmatch_backend.wsgi.application'
+ASGI_APPLICATION = 'friendmatch_backend.asgi.application'
+
+# Channel layer for real-time messaging. The in-memory layer only reaches
+# sockets in the same process; with several workers use Redis:
+# {'BACKEND': 'channels_redis.core.RedisChannelLayer',
+#  'CONFIG': {'hosts': [('127.0.0.1', 6379)]}}
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 # Database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the default in-memory database, so the
+        # concurrency tests' threads share it with SQLite's normal locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -170,6 +187,45 @@ DEFAULT_FROM_EMAIL = 'your-email@gmail.com'
 OTP_LENGTH = 6
 OTP_EXPIRY_MINUTES = 10
 
+# Cache. Swipe pools and cards and unread badges are invalidated through it,
+# so with more than one worker process it must be shared, e.g.
+# {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+# 'LOCATION': 'redis://127.0.0.1:6379'}. The in-process cache below is only
+# correct with a single worker (``check`` warns about it when DEBUG is off).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Swipe deck settings
+SWIPE_DECK_SIZE = 200  # Profiles materialized per deck build
+SWIPE_DECK_PAGE_SIZE = 20
+SWIPE_DECK_MAX_PAGE_SIZE = 50
+SWIPE_DECK_REFILL_THRESHOLD = 40  # Refill once fewer profiles than this remain
+SWIPE_DECK_REFILL_WORKERS = 2
+SWIPE_DECK_INBOUND_RATE = 0.25  # Share of deck slots given to users who already waved
+SWIPE_DECK_SUGGESTION_RATE = 0.15  # Share of deck slots given to friend-of-friend suggestions
+FRIEND_SUGGESTION_LIMIT = 50  # Suggestions kept per user
+SWIPE_BATCH_MAX_SIZE = 100  # Swipes accepted per batch request
+SWIPE_HISTORY_PAGE_SIZE = 50
+SWIPE_HISTORY_MAX_PAGE_SIZE = 200
+SWIPE_HISTORY_EXPORT_CHUNK_SIZE = 500  # Swipes fetched per query while streaming an export
+SWIPE_POOL_CACHE_TIMEOUT = 600  # Seconds a (university, year) candidate pool stays cached
+SWIPE_CARD_CACHE_TIMEOUT = 3600
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_MAX_PAGE_SIZE = 200
+UNREAD_COUNT_CACHE_TIMEOUT = 60  # Seconds an unread badge count stays cached
+MESSAGE_BATCH_MAX_SIZE = 100  # Most queued messages a client may send in one request
+MESSAGE_POLL_TIMEOUT = 25  # Seconds a long-poll waits for new messages by default
+MESSAGE_POLL_MAX_TIMEOUT = 55  # Upper bound for the timeout a client may ask for
+MESSAGE_IMAGE_MAX_UPLOAD_SIZE = 15 * 1024 * 1024  # Bytes
+MESSAGE_IMAGE_MAX_PIXELS = 50_000_000  # Larger images are rejected before decoding
+MESSAGE_IMAGE_DISPLAY_SIZE = 1280  # Longest side of the image shown in the chat
+MESSAGE_IMAGE_THUMBNAIL_SIZE = 320
+MESSAGE_IMAGE_PLACEHOLDER_SIZE = 16
+MESSAGE_IMAGE_WORKERS = 2
+
 # Admin email for reports
 ADMIN_EMAIL = 'admin@friendmatch.com'
 
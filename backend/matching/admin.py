@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Swipe, Match, FullConnection
+from .models import (
+    Swipe, Match, FullConnection, SwipeDeck, SeenSet, SkipArchive, PendingWave,
+    FriendSuggestion, SuggestionBuild
+)
 
 
 @admin.register(Swipe)
@@ -26,3 +29,53 @@ class FullConnectionAdmin(admin.ModelAdmin):
     readonly_fields = ('completed_at', 'created_at')
     ordering = ('-created_at',)
 
+
+
+@admin.register(SwipeDeck)
+class SwipeDeckAdmin(admin.ModelAdmin):
+    list_display = ('user', 'generation', 'built_at')
+    search_fields = ('user__university_email',)
+    readonly_fields = ('built_at',)
+    ordering = ('-built_at',)
+
+
+@admin.register(SeenSet)
+class SeenSetAdmin(admin.ModelAdmin):
+    list_display = ('user', 'size', 'updated_at')
+    search_fields = ('user__university_email',)
+    exclude = ('data',)
+    readonly_fields = ('size', 'version', 'updated_at')
+    ordering = ('-updated_at',)
+
+
+@admin.register(SkipArchive)
+class SkipArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'size', 'updated_at')
+    search_fields = ('user__university_email',)
+    exclude = ('data',)
+    readonly_fields = ('size', 'updated_at')
+    ordering = ('-updated_at',)
+
+
+@admin.register(PendingWave)
+class PendingWaveAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'sender', 'created_at')
+    search_fields = ('recipient__university_email', 'sender__university_email')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
+
+
+@admin.register(FriendSuggestion)
+class FriendSuggestionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'suggested_user', 'mutual_matches', 'created_at')
+    search_fields = ('user__university_email', 'suggested_user__university_email')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
+
+
+@admin.register(SuggestionBuild)
+class SuggestionBuildAdmin(admin.ModelAdmin):
+    list_display = ('built_at', 'incremental', 'last_match_id', 'users_updated', 'suggestions')
+    list_filter = ('incremental',)
+    readonly_fields = ('built_at',)
+    ordering = ('-built_at',)
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class MatchingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'matching'
+    
+    def ready(self):
+        from . import checks
 
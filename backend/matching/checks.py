@@ -0,0 +1,39 @@
+"""
+System checks for deployment assumptions.
+
+Swipe pools and cards (``profiles.pools``) and unread badges
+(``messaging.counters``) are invalidated by deleting or replacing cache
+keys. That only reaches every worker when they share one cache; with a
+per-process cache, workers that did not handle a write keep serving their
+own copy until it expires.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_is_shared(alias='default'):
+    """Whether all worker processes see the same cache"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when a production configuration keeps the cache in each process"""
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [
+        Warning(
+            "The default cache is local to each worker process.",
+            hint=(
+                "Cached swipe pools, cards and unread badges are only invalidated "
+                "in the process that made the change. Use a shared backend such as "
+                "django.core.cache.backends.redis.RedisCache, or run one worker."
+            ),
+            id='matching.W001',
+        )
+    ]
@@ -0,0 +1,139 @@
+"""
+Cold storage for old skip swipes.
+
+Most ``Swipe`` rows are skips that are only ever read to keep a profile out of
+the feed. Once they are old, ``compact_user_skips`` moves them into one
+``SkipArchive`` row per user: entries sorted by ``(created_at, id)`` and
+stored as delta-encoded varints, typically a few bytes per swipe. Waves stay
+as ordinary rows.
+
+Readers see both tiers:
+
+- feed exclusion goes through the seen set, which covers archived ids too
+- a re-swipe on an archived user drops the archived entry, so the new hot
+  row is the only copy of that pair (see ``record_swipes``)
+- a wave at someone who skipped the swiper is never indexed as pending, as
+  their seen set still has the swiper after the skip is archived
+- swipe history merges archived entries back in by ``(created_at, id)``
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+
+from .models import Swipe, SkipArchive
+
+ArchivedSkip = namedtuple('ArchivedSkip', ['created_at', 'id', 'swiped_user_id'])
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_entries(entries):
+    """Pack ``ArchivedSkip`` entries (sorted by created_at, id) into bytes"""
+    out = bytearray()
+    _write_varint(out, len(entries))
+    prev_time = prev_id = prev_user = 0
+    for entry in entries:
+        micros = (entry.created_at - EPOCH) // MICROSECOND
+        _write_varint(out, micros - prev_time)
+        _write_varint(out, _zigzag(entry.id - prev_id))
+        _write_varint(out, _zigzag(entry.swiped_user_id - prev_user))
+        prev_time, prev_id, prev_user = micros, entry.id, entry.swiped_user_id
+    return bytes(out)
+
+
+def decode_entries(data):
+    """Unpack bytes produced by ``encode_entries``"""
+    data = bytes(data)
+    if not data:
+        return []
+    count, pos = _read_varint(data, 0)
+    entries = []
+    micros = pk = user_id = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        micros += delta
+        delta, pos = _read_varint(data, pos)
+        pk += _unzigzag(delta)
+        delta, pos = _read_varint(data, pos)
+        user_id += _unzigzag(delta)
+        entries.append(ArchivedSkip(EPOCH + micros * MICROSECOND, pk, user_id))
+    return entries
+
+
+def load_archived(user_id):
+    """Get a user's archived skips, oldest first"""
+    data = SkipArchive.objects.filter(user_id=user_id).values_list('data', flat=True).first()
+    return decode_entries(data) if data is not None else []
+
+
+def _save_archive(user_id, entries):
+    SkipArchive.objects.update_or_create(
+        user_id=user_id,
+        defaults={'data': encode_entries(entries), 'size': len(entries)}
+    )
+
+
+def compact_user_skips(user_id, older_than):
+    """
+    Move a user's skips created before ``older_than`` into their archive.
+
+    Returns the number of swipes moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            Swipe.objects.select_for_update().filter(
+                swiper_id=user_id,
+                action='skip',
+                created_at__lt=older_than
+            ).values_list('created_at', 'id', 'swiped_user_id')
+        )
+        if not rows:
+            return 0
+
+        archive = SkipArchive.objects.select_for_update().filter(user_id=user_id).first()
+        entries = decode_entries(archive.data) if archive else []
+        entries.extend(ArchivedSkip(*row) for row in rows)
+        entries.sort()
+        _save_archive(user_id, entries)
+        Swipe.objects.filter(id__in=[row[1] for row in rows]).delete()
+    return len(rows)
+
+
+def drop_archived(user_id, swiped_user_ids):
+    """Remove archived entries for users that have just been swiped again"""
+    swiped_user_ids = set(swiped_user_ids)
+    archive = SkipArchive.objects.select_for_update().filter(user_id=user_id).first()
+    if archive is None:
+        return
+    entries = decode_entries(archive.data)
+    kept = [entry for entry in entries if entry.swiped_user_id not in swiped_user_ids]
+    if len(kept) != len(entries):
+        _save_archive(user_id, kept)
@@ -0,0 +1,268 @@
+"""
+Precomputed swipe decks.
+
+Each user has a ``SwipeDeck`` row holding an ordered list of candidate profile
+ids, ranked by compatibility. The feed hands the deck out in fixed-size pages
+addressed by an opaque cursor, and a small background worker pool refills the
+deck as it drains, so serving a page never has to scan the user's swipe
+history.
+"""
+import base64
+import binascii
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from profiles.models import UserProfile
+from profiles.pools import get_cards, get_pool, pool_positions
+from profiles.tags import profile_tokens, profiles_with_any_tag
+from .models import FriendSuggestion, PendingWave, SwipeDeck
+from .ranking import feature_vector, rank_candidates
+from .seen import load_seen
+
+logger = logging.getLogger(__name__)
+
+_refill_executor = ThreadPoolExecutor(
+    max_workers=settings.SWIPE_DECK_REFILL_WORKERS,
+    thread_name_prefix='swipe-deck'
+)
+_pending_refills = set()
+_pending_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    """Raised when a deck cursor cannot be decoded"""
+
+
+def encode_cursor(generation, offset):
+    """Encode a deck position as an opaque cursor string"""
+    raw = f"{generation}:{offset}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (generation, offset) pair"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        generation, offset = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        generation, offset = int(generation), int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    if generation < 0 or offset < 0:
+        raise InvalidCursor("Invalid cursor")
+    return generation, offset
+
+
+def mix_in(ranked, priority, rate, limit):
+    """
+    Interleave ``priority`` ids into ``ranked`` so that about ``rate`` of the
+    first ``limit`` slots go to priority ids, spread evenly. Whichever list
+    runs out first leaves the remaining slots to the other.
+    """
+    mixed = []
+    ranked, priority = iter(ranked), iter(priority)
+    owed = 0.0
+    while len(mixed) < limit:
+        owed += rate
+        first, second = (priority, ranked) if owed >= 1 else (ranked, priority)
+        pick = next(first, None)
+        if pick is None:
+            pick = next(second, None)
+            if pick is None:
+                break
+        elif first is priority:
+            owed -= 1
+        mixed.append(pick)
+    return mixed
+
+
+def get_candidate_ids(user_id, viewer, exclude, limit):
+    """
+    Get up to ``limit`` profile ids from the viewer's (university, year) pool
+    that the user has not swiped yet.
+
+    ``viewer`` is a dict of the user's ``year``, ``hobbies``, ``interests``
+    and ``user__university_id``. Profiles sharing at least one tag with the
+    viewer are pulled from the tag index and ranked by compatibility first;
+    the rest of the pool fills any remaining slots in primary-key order.
+    Users who have already waved at the viewer are mixed in at
+    ``SWIPE_DECK_INBOUND_RATE``, most recent wave first, and friend-of-friend
+    suggestions at ``SWIPE_DECK_SUGGESTION_RATE``.
+    """
+    seen = load_seen(user_id)
+    pool = get_pool(viewer['user__university_id'], viewer['year'])
+
+    def is_candidate(profile_id):
+        return profile_id != user_id and profile_id not in seen and profile_id not in exclude
+
+    def in_pool(profile_ids):
+        profile_ids = list(profile_ids)
+        return [
+            (profile_id, position)
+            for profile_id, position in zip(profile_ids, pool_positions(pool, profile_ids).tolist())
+            if position >= 0 and is_candidate(profile_id)
+        ]
+
+    inbound = [profile_id for profile_id, _ in in_pool(PendingWave.objects.filter(
+        recipient_id=user_id
+    ).order_by('-created_at').values_list('sender_id', flat=True)[:limit])]
+    exclude = exclude | set(inbound)
+    suggested = [profile_id for profile_id, _ in in_pool(FriendSuggestion.objects.filter(
+        user_id=user_id
+    ).order_by('-mutual_matches').values_list('suggested_user_id', flat=True)[:limit])]
+    exclude = exclude | set(suggested)
+
+    viewer_tokens = profile_tokens(viewer['hobbies'], viewer['interests'])
+    shared_ids = profiles_with_any_tag(viewer_tokens).filter(
+        profile__year=viewer['year'],
+        profile__user__university_id=viewer['user__university_id']
+    )
+    candidates = in_pool(sorted(shared_ids))
+    candidate_ids = [profile_id for profile_id, _ in candidates]
+    # The pool's feature matrix is cached with it, so ranking only scores it
+    ranked = rank_candidates(
+        feature_vector(viewer_tokens),
+        candidate_ids,
+        pool['features'],
+        limit=limit,
+        rows=[position for _, position in candidates]
+    )
+    if len(ranked) < limit:
+        ranked_set = set(candidate_ids)
+        for profile_id in pool['ids']:
+            if profile_id not in ranked_set and is_candidate(profile_id):
+                ranked.append(profile_id)
+                if len(ranked) >= limit:
+                    break
+    ranked = mix_in(ranked, suggested, settings.SWIPE_DECK_SUGGESTION_RATE, limit)
+    return mix_in(ranked, inbound, settings.SWIPE_DECK_INBOUND_RATE, limit)
+
+
+def build_deck(user_id, served=0, expected_generation=None):
+    """
+    Rebuild a user's deck.
+
+    Profiles past ``served`` in the current deck have not been handed out yet
+    and are kept at the front; the rest of the deck is topped up with fresh
+    candidates. The new deck is only written if nobody rebuilt it in the
+    meantime (and, if given, it is still at ``expected_generation``).
+    """
+    deck, created = SwipeDeck.objects.get_or_create(user_id=user_id)
+    if expected_generation is not None and deck.generation != expected_generation:
+        return deck
+
+    served = min(served, len(deck.profile_ids))
+    handed_out = deck.profile_ids[:served]
+    remaining = deck.profile_ids[served:]
+
+    profile_ids = []
+    viewer = UserProfile.objects.filter(pk=user_id).values(
+        'year', 'hobbies', 'interests', 'user__university_id'
+    ).first()
+    if viewer is not None:
+        fresh = get_candidate_ids(
+            user_id,
+            viewer,
+            exclude=set(handed_out),
+            limit=settings.SWIPE_DECK_SIZE
+        )
+        fresh_set = set(fresh)
+        # Keep unserved profiles that are still swipeable, in their original order
+        profile_ids = [pk for pk in remaining if pk in fresh_set]
+        kept = set(profile_ids)
+        profile_ids += [pk for pk in fresh if pk not in kept]
+        profile_ids = profile_ids[:settings.SWIPE_DECK_SIZE]
+
+    rebased_from = 0 if created else served
+    updated = SwipeDeck.objects.filter(
+        user_id=user_id,
+        generation=deck.generation
+    ).update(
+        profile_ids=profile_ids,
+        generation=deck.generation + 1,
+        rebased_from=rebased_from,
+        built_at=timezone.now()
+    )
+    if not updated:
+        # Lost the race to a concurrent rebuild; use its result
+        return SwipeDeck.objects.get(user_id=user_id)
+
+    deck.profile_ids = profile_ids
+    deck.generation += 1
+    deck.rebased_from = rebased_from
+    return deck
+
+
+def _refill(user_id, served, generation):
+    """Background task: rebuild a deck that is running low"""
+    close_old_connections()
+    try:
+        build_deck(user_id, served=served, expected_generation=generation)
+    except Exception:
+        logger.exception("Failed to refill swipe deck for user %s", user_id)
+    finally:
+        with _pending_lock:
+            _pending_refills.discard(user_id)
+        close_old_connections()
+
+
+def schedule_refill(user_id, served, generation):
+    """
+    Queue a background refill for a user's deck unless one is pending. The
+    refill is only registered once the transaction commits, so a rollback
+    cannot leave the user marked as pending forever.
+    """
+    def submit():
+        with _pending_lock:
+            if user_id in _pending_refills:
+                return
+            _pending_refills.add(user_id)
+        _refill_executor.submit(_refill, user_id, served, generation)
+
+    transaction.on_commit(submit)
+
+
+def get_deck_page(user, cursor=None, page_size=None):
+    """
+    Get one page of the user's deck.
+
+    Returns ``(cards, next_cursor)``, where ``cards`` are pre-rendered swipe
+    cards. Profiles that were shown but never swiped stay candidates, so
+    paging past the end of the deck rebuilds it and they come round again;
+    ``next_cursor`` is only None when the user has no candidates at all.
+    """
+    page_size = page_size or settings.SWIPE_DECK_PAGE_SIZE
+
+    deck = SwipeDeck.objects.filter(user=user).first()
+    if deck is None:
+        deck = build_deck(user.id)
+
+    offset = 0
+    if cursor:
+        generation, offset = decode_cursor(cursor)
+        if generation == deck.generation - 1:
+            # The deck was refilled since this cursor was issued
+            offset = max(offset - deck.rebased_from, 0)
+        elif generation != deck.generation:
+            offset = 0
+
+    if offset >= len(deck.profile_ids):
+        deck = build_deck(user.id, served=offset, expected_generation=deck.generation)
+        offset = 0
+
+    page_ids = deck.profile_ids[offset:offset + page_size]
+    next_offset = offset + len(page_ids)
+    # Drop profiles swiped since the deck was built (e.g. from another device)
+    seen = load_seen(user.id)
+    page_ids = [pk for pk in page_ids if pk not in seen]
+    if len(deck.profile_ids) - next_offset < settings.SWIPE_DECK_REFILL_THRESHOLD:
+        schedule_refill(user.id, next_offset, deck.generation)
+
+    cards_by_id = get_cards(page_ids)
+    cards = [cards_by_id[pk] for pk in page_ids if pk in cards_by_id]
+    next_cursor = encode_cursor(deck.generation, next_offset) if next_offset > offset else None
+    return cards, next_cursor
@@ -0,0 +1,140 @@
+"""
+Offline match-graph engine for friend-of-friend suggestions.
+
+All matches are loaded into a symmetric sparse adjacency matrix ``A`` over a
+compact index of user ids. Row ``u`` of ``A @ A`` counts the mutual matches
+between ``u`` and every other user, so one sparse product (taken in row
+chunks to bound memory) scores every friend-of-friend pair at once. Users
+who are already matched with ``u`` are dropped and the top candidates are
+written to ``FriendSuggestion``.
+
+Incremental runs only recompute rows whose neighborhood changed: both ends
+of every match created since the last build, plus their neighbors. Matches
+are never deleted individually, so that set is exact; a periodic full
+rebuild still picks up anything removed with a user.
+"""
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Match, FriendSuggestion, SuggestionBuild
+
+MatchGraph = namedtuple('MatchGraph', ['user_ids', 'adjacency'])
+
+
+def _edge_array(matches):
+    pairs = np.fromiter(
+        (user_id for pair in matches.values_list('user1_id', 'user2_id').iterator(chunk_size=10000) for user_id in pair),
+        dtype=np.int64
+    )
+    return pairs.reshape(-1, 2)
+
+
+def load_graph(last_match_id):
+    """Build the match graph from every match up to ``last_match_id``"""
+    pairs = _edge_array(Match.objects.filter(id__lte=last_match_id))
+    user_ids, edges = np.unique(pairs, return_inverse=True)
+    edges = edges.reshape(-1, 2)
+
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(user_ids), len(user_ids))
+    )
+    return MatchGraph(user_ids, adjacency)
+
+
+def touched_rows(graph, first_match_id, last_match_id):
+    """Rows whose friend-of-friend scores change with matches in the given id range"""
+    pairs = _edge_array(Match.objects.filter(id__gt=first_match_id, id__lte=last_match_id))
+    if not len(pairs):
+        return np.empty(0, dtype=np.int64)
+    ends = np.searchsorted(graph.user_ids, np.unique(pairs))
+    neighbors = graph.adjacency[ends].indices
+    return np.union1d(ends, neighbors)
+
+
+def friend_of_friend(graph, rows, limit, chunk_size=5000):
+    """
+    Yield ``(user_id, suggested_user_id, mutual_matches)`` for the given rows.
+
+    Each user gets at most ``limit`` suggestions, most mutual matches first
+    and lowest user id first among ties.
+    """
+    adjacency = graph.adjacency
+    user_ids = graph.user_ids
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        neighbors = adjacency[chunk]
+        counts = (neighbors @ adjacency).tocsr()
+        # Existing matches are not suggestions
+        counts = (counts - counts.multiply(neighbors)).tocsr()
+        counts.eliminate_zeros()
+
+        for offset, row in enumerate(chunk):
+            begin, end = counts.indptr[offset], counts.indptr[offset + 1]
+            cols = counts.indices[begin:end]
+            scores = counts.data[begin:end]
+            keep = cols != row
+            cols, scores = cols[keep], scores[keep]
+            if len(cols) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+                cols, scores = cols[top], scores[top]
+            order = np.lexsort((cols, -scores))
+            user_id = int(user_ids[row])
+            for col, score in zip(cols[order], scores[order]):
+                yield user_id, int(user_ids[col]), int(score)
+
+
+def build_suggestions(incremental=False, limit=None, batch_size=5000):
+    """
+    Recompute friend-of-friend suggestions and record the run.
+
+    With ``incremental`` only users affected by matches created since the
+    last build are recomputed; without a previous build this falls back to
+    a full rebuild. Returns the ``SuggestionBuild`` row.
+    """
+    limit = limit or settings.FRIEND_SUGGESTION_LIMIT
+    previous = SuggestionBuild.objects.order_by('-id').first()
+    incremental = incremental and previous is not None
+    last_match_id = Match.objects.aggregate(last=Max('id'))['last'] or 0
+
+    graph = load_graph(last_match_id)
+    if incremental:
+        rows = touched_rows(graph, previous.last_match_id, last_match_id)
+    else:
+        rows = np.arange(len(graph.user_ids))
+    user_ids = [int(user_id) for user_id in graph.user_ids[rows]]
+
+    total = 0
+    batch = []
+    with transaction.atomic():
+        stale = FriendSuggestion.objects.all()
+        if incremental:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        for user_id, suggested_user_id, mutual_matches in friend_of_friend(graph, rows, limit):
+            batch.append(FriendSuggestion(
+                user_id=user_id,
+                suggested_user_id=suggested_user_id,
+                mutual_matches=mutual_matches
+            ))
+            if len(batch) >= batch_size:
+                FriendSuggestion.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        FriendSuggestion.objects.bulk_create(batch)
+        total += len(batch)
+
+        return SuggestionBuild.objects.create(
+            last_match_id=last_match_id,
+            incremental=incremental,
+            users_updated=len(user_ids),
+            suggestions=total
+        )
@@ -0,0 +1,122 @@
+"""
+Swipe history reads.
+
+History is ordered newest first by ``(created_at, id)`` and paginated with a
+keyset cursor on that pair, so fetching page N costs the same as page 1. The
+export path walks the same keyset one chunk at a time, so it never holds more
+than a chunk of rows however it is served. Skips compacted into the user's
+``SkipArchive`` keep their original ids and timestamps and are merged back in
+on both paths.
+"""
+import base64
+import binascii
+from bisect import bisect_left
+from datetime import datetime
+
+from django.db.models import Q
+
+from accounts.models import User
+from .cold import load_archived
+from .deck import InvalidCursor
+from .models import Swipe
+
+
+def encode_cursor(created_at, pk):
+    """Encode the position after a swipe as an opaque cursor string"""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (created_at, id) pair"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def history_queryset(user):
+    """A user's hot swipes, newest first, with the swiped profiles joined in"""
+    return Swipe.objects.filter(swiper=user).select_related(
+        'swiped_user__profile'
+    ).order_by('-created_at', '-id')
+
+
+def _history_key(swipe):
+    return (swipe.created_at, swipe.id)
+
+
+def _archived_swipes(user, entries):
+    """Turn archived skip entries back into unsaved ``Swipe`` instances"""
+    users = User.objects.select_related('profile').in_bulk(
+        [entry.swiped_user_id for entry in entries]
+    )
+    return [
+        Swipe(
+            id=entry.id,
+            swiper=user,
+            swiped_user=users[entry.swiped_user_id],
+            action='skip',
+            created_at=entry.created_at
+        )
+        for entry in entries
+        # Skip users deleted since their swipe was archived
+        if entry.swiped_user_id in users
+    ]
+
+
+def get_history_chunk(user, archived, after=None, size=500):
+    """
+    Get the next ``size`` swipes of a user's history older than the key ``after``.
+
+    ``archived`` is the user's ``load_archived`` entries. Returns
+    ``(swipes, last_key)``, where ``last_key`` is the ``(created_at, id)`` of the
+    last swipe, or None when the history has no more swipes.
+    """
+    swipes = history_queryset(user)
+    if after:
+        created_at, pk = after
+        swipes = swipes.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+        archived = archived[:bisect_left(archived, after)]
+
+    # Fetch one extra row from each tier to know whether there are more
+    hot = list(swipes[:size + 1])
+    cold = archived[-(size + 1):][::-1]
+    candidates = sorted(
+        [(_history_key(swipe), swipe) for swipe in hot]
+        + [((entry.created_at, entry.id), entry) for entry in cold],
+        key=lambda item: item[0],
+        reverse=True
+    )
+
+    last_key = None
+    if len(candidates) > size:
+        candidates = candidates[:size]
+        last_key = candidates[-1][0]
+
+    restored = {
+        swipe.id: swipe
+        for swipe in _archived_swipes(user, [item for _, item in candidates if not isinstance(item, Swipe)])
+    }
+    chunk = []
+    for _, item in candidates:
+        if isinstance(item, Swipe):
+            chunk.append(item)
+        elif item.id in restored:
+            chunk.append(restored[item.id])
+    return chunk, last_key
+
+
+def get_history_page(user, cursor=None, page_size=50):
+    """
+    Get one page of a user's swipe history across hot and archived swipes.
+
+    Returns ``(swipes, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    swipes, last_key = get_history_chunk(user, load_archived(user.id), after, page_size)
+    return swipes, last_key and encode_cursor(*last_key)
@@ -0,0 +1,95 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from profiles.pools import get_pool
+
+ENDPOINTS = ['swipe_user', 'get_swipeable_profiles', 'get_matches', 'get_chat_list']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the swipe, feed, match and chat endpoints in-process with the test client. '
+        'Swipes are really recorded, so run it against a synthetic population (see generate_population).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint')
+        parser.add_argument('--users', type=int, default=100, help='Distinct users to send requests as')
+        parser.add_argument('--wave-rate', type=float, default=0.3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.wave_rate = options['wave_rate']
+
+        user_ids = list(User.objects.filter(profile__isnull=False).values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError('No users with profiles; run generate_population first')
+        users = list(User.objects.select_related('profile').filter(
+            id__in=self.rng.sample(user_ids, min(options['users'], len(user_ids)))
+        ))
+        self.clients = {}
+        for user in users:
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients[user.id] = client
+
+        self.stdout.write(
+            f"{'endpoint':<24} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8} {'max q':>6}"
+        )
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for endpoint in options['endpoints']:
+                request = getattr(self, endpoint)
+                for _ in range(options['warmup']):
+                    request(self.rng.choice(users))
+
+                timings, queries, errors = [], [], 0
+                for _ in range(options['requests']):
+                    user = self.rng.choice(users)
+                    with CaptureQueriesContext(connection) as context:
+                        start = time.perf_counter()
+                        response = request(user)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries.append(len(context))
+                    if response.status_code >= 400:
+                        errors += 1
+
+                p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+                self.stdout.write(
+                    f"{endpoint:<24} {len(timings):>8} {errors:>7} {p50:>8.2f} {p95:>8.2f} "
+                    f"{p99:>8.2f} {np.mean(queries):>8.1f} {max(queries):>6}"
+                )
+
+    def swipe_user(self, user):
+        # Pick the target before the request so the lookup is not timed
+        candidates = get_pool(user.university_id, user.profile.year)['ids']
+        target = self.rng.choice(candidates)
+        if target == user.id:
+            target = candidates[(candidates.index(target) + 1) % len(candidates)]
+        action = 'wave' if self.rng.random() < self.wave_rate else 'skip'
+        return self.clients[user.id].post(
+            reverse('swipe_user'),
+            {'swiped_user': target, 'action': action},
+            format='json'
+        )
+
+    def get_swipeable_profiles(self, user):
+        return self.clients[user.id].get(reverse('swipeable_profiles'))
+
+    def get_matches(self, user):
+        return self.clients[user.id].get(reverse('get_matches'))
+
+    def get_chat_list(self, user):
+        return self.clients[user.id].get(reverse('chat_list'))
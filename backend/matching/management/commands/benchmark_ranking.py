@@ -0,0 +1,71 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from matching.ranking import feature_matrix, feature_vector, rank_candidates
+from profiles.pools import pool_positions
+from profiles.tags import tokenize
+
+VOCABULARY = [
+    'hiking', 'chess', 'music', 'cooking', 'coding', 'travel', 'art', 'photography',
+    'gaming', 'reading', 'soccer', 'basketball', 'yoga', 'running', 'dancing', 'writing',
+    'volunteering', 'fashion', 'film', 'anime', 'robotics', 'startups', 'finance', 'poetry',
+    'climbing', 'swimming', 'baking', 'guitar', 'piano', 'theater', 'debate', 'astronomy',
+    'biology', 'history', 'philosophy', 'politics', 'economics', 'design', 'skating', 'surfing',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batched compatibility ranking against synthetic candidate pools'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=200, help='Deck size to select')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def random_text():
+            return ', '.join(rng.sample(VOCABULARY, rng.randint(2, 8)))
+
+        viewer_vector = feature_vector(set(tokenize(random_text())))
+
+        # "pool build" is paid once per pool version (see profiles.pools); a
+        # deck build looks up its candidates' rows in the cached pool, scores
+        # the pool and ranks them, which is what "deck p50/max" measures.
+        # "cold" is a deck build right after the pool was invalidated.
+        self.stdout.write(
+            f"{'candidates':>12} {'pool build ms':>14} {'deck p50 ms':>12} {'deck max ms':>12} {'cold ms':>10}"
+        )
+        for size in options['sizes']:
+            token_sets = [set(tokenize(random_text())) for _ in range(size)]
+            candidate_ids = list(range(1, size + 1))
+
+            start = time.perf_counter()
+            pool = {
+                'ids': candidate_ids,
+                'id_array': np.array(candidate_ids, dtype=np.int64),
+                'features': feature_matrix(token_sets)
+            }
+            build_ms = (time.perf_counter() - start) * 1000
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                rank_candidates(
+                    viewer_vector,
+                    candidate_ids,
+                    pool['features'],
+                    limit=options['limit'],
+                    rows=pool_positions(pool, candidate_ids)
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"{size:>12} {build_ms:>14.1f} {np.median(timings):>12.2f} {max(timings):>12.2f}"
+                f" {build_ms + np.median(timings):>10.1f}"
+            )
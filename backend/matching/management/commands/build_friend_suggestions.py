@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from matching.graph import build_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Compute friend-of-friend suggestions from the match graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only recompute users whose neighborhood changed since the last build'
+        )
+        parser.add_argument('--limit', type=int, help='Suggestions kept per user')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        build = build_suggestions(incremental=options['incremental'], limit=options['limit'])
+        elapsed = time.perf_counter() - started
+
+        kind = 'Incremental' if build.incremental else 'Full'
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind} build up to match {build.last_match_id}: "
+            f"{build.suggestions} suggestions for {build.users_updated} users in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from matching.cold import compact_user_skips
+from matching.models import Swipe
+
+
+class Command(BaseCommand):
+    help = 'Move old skip swipes out of the Swipe table into packed per-user archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=30,
+            help='Only compact skips older than this many days'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users fetched per query')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        user_ids = Swipe.objects.filter(
+            action='skip',
+            created_at__lt=cutoff
+        ).order_by('swiper_id').values_list('swiper_id', flat=True).distinct()
+
+        users = moved = 0
+        last_id = 0
+        while True:
+            # Each batch is read in full before compacting deletes swipes,
+            # rather than holding a cursor open over the table being changed
+            batch = list(user_ids.filter(swiper_id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for user_id in batch:
+                moved += compact_user_skips(user_id, cutoff)
+                users += 1
+            last_id = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {moved} skips older than {options['older_than_days']} days for {users} users"
+        ))
@@ -0,0 +1,193 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from accounts.models import University, User
+from matching.models import Swipe, Match
+from messaging.models import Message, ReadWatermark
+from profiles.models import UserProfile
+from profiles.pools import invalidate_pool
+
+FIRST_NAMES = [
+    'Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+    'Maya', 'Noah', 'Leila', 'Omar', 'Priya', 'Diego', 'Mei', 'Kofi', 'Sofia', 'Arjun',
+]
+
+HOBBIES = [
+    'hiking', 'chess', 'cooking', 'photography', 'gaming', 'reading', 'soccer', 'basketball',
+    'yoga', 'running', 'dancing', 'writing', 'climbing', 'swimming', 'baking', 'guitar',
+    'piano', 'skating', 'surfing', 'board games', 'thrifting', 'gardening', 'cycling',
+]
+
+INTERESTS = [
+    'coding', 'travel', 'art', 'music', 'film', 'anime', 'robotics', 'startups', 'finance',
+    'poetry', 'theater', 'debate', 'astronomy', 'biology', 'history', 'philosophy',
+    'politics', 'economics', 'design', 'fashion', 'volunteering', 'machine learning',
+]
+
+MESSAGES = [
+    'Hey! How is your week going?', 'Want to grab coffee after class?',
+    'That sounds fun, count me in', 'Haha same here', 'Are you going to the game this weekend?',
+    'I just finished my midterm', 'Which dining hall is your favorite?', 'See you there!',
+]
+
+YEARS = [year for year, _ in UserProfile.YEAR_CHOICES]
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create a synthetic population of users, profiles, swipes, matches and messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--universities', type=int, default=2)
+        parser.add_argument('--users', type=int, default=1000, help='Users per university')
+        parser.add_argument('--swipes-per-user', type=int, default=50)
+        parser.add_argument('--wave-rate', type=float, default=0.3, help='Share of swipes that are waves')
+        parser.add_argument('--messages-per-match', type=int, default=5)
+        parser.add_argument('--password', default='synthetic-pass')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            universities = self.create_universities(options['universities'])
+            pools = self.create_users(universities, options['users'], options['password'])
+            swipes = self.create_swipes(pools, options['swipes_per_user'], options['wave_rate'])
+            matches = self.create_matches(swipes)
+            messages = self.create_messages(matches, options['messages_per_match'])
+
+        # Derived structures are rebuilt from the rows written above
+        call_command('rebuild_profile_tags', stdout=self.stdout)
+        call_command('rebuild_seen_sets', stdout=self.stdout)
+        call_command('rebuild_pending_waves', stdout=self.stdout)
+        call_command('rebuild_chat_summaries', stdout=self.stdout)
+        call_command('repair_unread_counters', stdout=self.stdout)
+        for university in universities:
+            invalidate_pool(university.id)
+
+        users = sum(len(ids) for pool in pools.values() for ids in pool.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {users} users, {len(swipes)} swipes, {len(matches)} matches and "
+            f"{messages} messages in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def create_universities(self, count):
+        start = University.objects.count()
+        universities = [
+            University(name=f'Synthetic University {start + i}', domain=f'synthetic{start + i}.edu')
+            for i in range(count)
+        ]
+        University.objects.bulk_create(universities)
+        return list(University.objects.filter(domain__in=[u.domain for u in universities]))
+
+    def create_users(self, universities, count, password):
+        """Create users and profiles; returns {university_id: {year: [user ids]}}"""
+        # Hashing once keeps generation fast; every synthetic user shares the password
+        password = make_password(password)
+        pools = {}
+        for university in universities:
+            emails = [f'user{i}@{university.domain}' for i in range(count)]
+            User.objects.bulk_create(
+                [
+                    User(
+                        username=email,
+                        university_email=email,
+                        university=university,
+                        password=password,
+                        is_verified=True
+                    )
+                    for email in emails
+                ],
+                batch_size=self.batch_size
+            )
+            user_ids = list(User.objects.filter(university=university).values_list('id', flat=True))
+
+            profiles = []
+            pools[university.id] = {}
+            for user_id in user_ids:
+                name = self.rng.choice(FIRST_NAMES)
+                year = self.rng.choice(YEARS)
+                profiles.append(UserProfile(
+                    user_id=user_id,
+                    full_name=f'{name} {user_id}',
+                    preferred_name=name,
+                    year=year,
+                    hobbies=', '.join(self.rng.sample(HOBBIES, self.rng.randint(2, 6))),
+                    interests=', '.join(self.rng.sample(INTERESTS, self.rng.randint(2, 6)))
+                ))
+                pools[university.id].setdefault(year, []).append(user_id)
+            UserProfile.objects.bulk_create(profiles, batch_size=self.batch_size)
+        return pools
+
+    def create_swipes(self, pools, per_user, wave_rate):
+        """Swipe within each (university, year) pool; returns {(swiper, swiped): action}"""
+        swipes = {}
+        for by_year in pools.values():
+            for user_ids in by_year.values():
+                for swiper_id in user_ids:
+                    # One extra sample covers the swiper drawing themselves
+                    for swiped_id in self.rng.sample(user_ids, min(per_user + 1, len(user_ids))):
+                        if swiped_id != swiper_id:
+                            swipes[(swiper_id, swiped_id)] = 'wave' if self.rng.random() < wave_rate else 'skip'
+        Swipe.objects.bulk_create(
+            [
+                Swipe(swiper_id=swiper_id, swiped_user_id=swiped_id, action=action)
+                for (swiper_id, swiped_id), action in swipes.items()
+            ],
+            batch_size=self.batch_size
+        )
+        return swipes
+
+    def create_matches(self, swipes):
+        pairs = {
+            (min(swiper_id, swiped_id), max(swiper_id, swiped_id))
+            for (swiper_id, swiped_id), action in swipes.items()
+            if action == 'wave' and swipes.get((swiped_id, swiper_id)) == 'wave'
+        }
+        last_id = Match.objects.aggregate(last=Max('id'))['last'] or 0
+        Match.objects.bulk_create(
+            [Match(user1_id=user1_id, user2_id=user2_id) for user1_id, user2_id in sorted(pairs)],
+            batch_size=self.batch_size
+        )
+        return list(Match.objects.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'user1_id', 'user2_id'
+        ))
+
+    def create_messages(self, matches, per_match):
+        total = 0
+        for start in range(0, len(matches), self.batch_size):
+            messages = []
+            members = {}
+            for match_id, user1_id, user2_id in matches[start:start + self.batch_size]:
+                members[match_id] = (user1_id, user2_id)
+                for _ in range(self.rng.randint(0, per_match * 2)):
+                    messages.append(Message(
+                        match_id=match_id,
+                        sender_id=self.rng.choice((user1_id, user2_id)),
+                        content=self.rng.choice(MESSAGES)
+                    ))
+            Message.objects.bulk_create(messages)
+
+            # About half of the users have read their chat to the end
+            last_ids = {}
+            for message in messages:
+                last_ids[message.match_id] = message.id
+            ReadWatermark.objects.bulk_create(
+                [
+                    ReadWatermark(match_id=match_id, user_id=user_id, last_read_message_id=last_id)
+                    for match_id, last_id in last_ids.items()
+                    for user_id in members[match_id]
+                    if self.rng.random() < 0.5
+                ],
+                batch_size=self.batch_size
+            )
+            total += len(messages)
+        return total
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from matching.models import Swipe, PendingWave
+from matching.seen import load_seen_many
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the inbound-wave index from existing swipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        answered = Swipe.objects.filter(
+            swiper_id=OuterRef('swiped_user_id'),
+            swiped_user_id=OuterRef('swiper_id')
+        )
+        waves = Swipe.objects.filter(action='wave').exclude(Exists(answered)).values_list(
+            'swiped_user_id', 'swiper_id', 'created_at'
+        ).iterator(chunk_size=options['batch_size'])
+
+        def unanswered(batch):
+            # Skips compacted into the cold archive have no hot row, but the
+            # recipient's seen set still has the sender
+            seen = load_seen_many({wave.recipient_id for wave in batch})
+            return [
+                wave for wave in batch
+                if wave.recipient_id not in seen or wave.sender_id not in seen[wave.recipient_id]
+            ]
+
+        total = 0
+        batch = []
+        with transaction.atomic():
+            PendingWave.objects.all().delete()
+            for recipient_id, sender_id, created_at in waves:
+                batch.append(PendingWave(recipient_id=recipient_id, sender_id=sender_id, created_at=created_at))
+                if len(batch) >= options['batch_size']:
+                    batch = unanswered(batch)
+                    PendingWave.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            batch = unanswered(batch)
+            PendingWave.objects.bulk_create(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} pending waves"))
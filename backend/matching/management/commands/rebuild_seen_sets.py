@@ -0,0 +1,67 @@
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from matching.cold import decode_entries
+from matching.models import Swipe, SeenSet, SkipArchive
+from matching.seen import pack_ids, rebuild_seen
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the per-user "already seen" sets from hot and archived swipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the seen set of this user id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            size = rebuild_seen(options['user'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt seen set for user {options['user']} ({size} ids)"
+            ))
+            return
+
+        hot = Swipe.objects.order_by('swiper_id').values_list(
+            'swiper_id', 'swiped_user_id'
+        ).iterator(chunk_size=5000)
+        archived = (
+            (user_id, entry.swiped_user_id)
+            for user_id, data in SkipArchive.objects.order_by('user_id').values_list(
+                'user_id', 'data'
+            ).iterator(chunk_size=500)
+            for entry in decode_entries(data)
+        )
+        # Both tiers are ordered by user, so they can be merged as streams
+        swipes = merge(hot, archived, key=itemgetter(0))
+
+        users = total_ids = total_bytes = 0
+        batch = []
+        with transaction.atomic():
+            SeenSet.objects.all().delete()
+            for swiper_id, rows in groupby(swipes, key=itemgetter(0)):
+                ids = sorted({swiped_user_id for _, swiped_user_id in rows})
+                seen_set = SeenSet(user_id=swiper_id, data=pack_ids(ids), size=len(ids))
+                batch.append(seen_set)
+                users += 1
+                total_ids += len(ids)
+                total_bytes += len(seen_set.data)
+                if len(batch) >= options['batch_size']:
+                    SeenSet.objects.bulk_create(batch)
+                    batch = []
+            SeenSet.objects.bulk_create(batch)
+
+        all_users = User.objects.count()
+        per_user = total_bytes / all_users if all_users else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt seen sets for {users} users "
+            f"({total_ids} swiped ids, {total_bytes / 1024:.1f} KiB packed)"
+        ))
+        self.stdout.write(
+            f"Average {per_user:.1f} bytes per user across {all_users} users; "
+            f"~{per_user * 100000 / (1024 * 1024):.2f} MiB per 100k users"
+        )
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from accounts.models import User
 from profiles.models import UserProfile
 
@@ -27,6 +28,10 @@ class Swipe(models.Model):
     class Meta:
         unique_together = ('swiper', 'swiped_user')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's history
+            models.Index(fields=['swiper', '-created_at', '-id'], name='swipe_history_idx'),
+        ]
     
     def __str__(self):
         return f"{self.swiper.university_email} {self.action} {self.swiped_user.university_email}"
@@ -99,3 +104,118 @@ class FullConnection(models.Model):
             self.match.save()
         super().save(*args, **kwargs)
 
+
+
+class SwipeDeck(models.Model):
+    """Precomputed, ordered queue of profiles to show a user in the swipe feed"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='swipe_deck',
+        primary_key=True
+    )
+    profile_ids = models.JSONField(default=list)
+    generation = models.PositiveIntegerField(default=0)
+    # Offset in the previous generation that became index 0 of this one
+    rebased_from = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Swipe deck for {self.user.university_email} ({len(self.profile_ids)} profiles)"
+
+
+class SeenSet(models.Model):
+    """Compact sorted array of the user ids a user has already swiped on"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='seen_set',
+        primary_key=True
+    )
+    data = models.BinaryField(default=b'')  # Packed little-endian uint32 ids
+    size = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Seen set for {self.user.university_email} ({self.size} users)"
+
+
+class SkipArchive(models.Model):
+    """Old skip swipes compacted into one packed row per user"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='skip_archive',
+        primary_key=True
+    )
+    # Delta-encoded varints of (created_at, swipe id, swiped user id) entries
+    data = models.BinaryField(default=b'')
+    size = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Archived skips for {self.user.university_email} ({self.size} swipes)"
+
+
+class PendingWave(models.Model):
+    """A wave the recipient has not responded to yet (inbound-wave index)"""
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='pending_waves'
+    )
+    sender = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='pending_waves_sent'
+    )
+    # When the wave was sent; a plain default so rebuilds can copy it from the swipe
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ('recipient', 'sender')
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='pending_wave_inbox_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sender.university_email} waiting on {self.recipient.university_email}"
+
+
+class FriendSuggestion(models.Model):
+    """Friend-of-friend candidate precomputed from the match graph"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='friend_suggestions'
+    )
+    suggested_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to'
+    )
+    mutual_matches = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('user', 'suggested_user')
+        indexes = [
+            models.Index(fields=['user', '-mutual_matches'], name='friend_suggestion_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Suggest {self.suggested_user.university_email} to {self.user.university_email}"
+
+
+class SuggestionBuild(models.Model):
+    """One run of the friend-suggestion job; the latest run is the incremental watermark"""
+    last_match_id = models.PositiveIntegerField()
+    incremental = models.BooleanField(default=False)
+    users_updated = models.PositiveIntegerField(default=0)
+    suggestions = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        kind = 'Incremental' if self.incremental else 'Full'
+        return f"{kind} suggestion build up to match {self.last_match_id}"
@@ -0,0 +1,81 @@
+"""
+Server-side compatibility ranking for swipe candidates.
+
+Profiles are turned into hashed bag-of-words feature vectors built from their
+``hobbies`` and ``interests`` text. A viewer is scored against every candidate
+in one matrix-vector product (cosine similarity), so ranking thousands of
+candidates costs a single sparse product instead of a Python loop over pairs.
+Candidate rows are built once per pool and cached with it (see
+``profiles.pools``); a deck build only slices out the rows it ranks.
+"""
+import zlib
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+FEATURE_DIM = 256
+
+
+@lru_cache(maxsize=65536)
+def _bucket(token):
+    # crc32 rather than hash() so buckets are stable across processes
+    return zlib.crc32(token.encode()) % FEATURE_DIM
+
+
+def feature_vector(tokens):
+    """Build the L2-normalized feature vector for one set of tokens"""
+    vector = np.zeros(FEATURE_DIM, dtype=np.float32)
+    vector[[_bucket(token) for token in tokens]] = 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def feature_matrix(token_sets):
+    """Build a sparse (n, FEATURE_DIM) CSR matrix of L2-normalized feature rows"""
+    lengths = np.fromiter(map(len, token_sets), dtype=np.int64, count=len(token_sets))
+    tokens = list(chain.from_iterable(token_sets))
+    cols = np.fromiter(map(_bucket, tokens), dtype=np.int32, count=len(tokens))
+    rows = np.repeat(np.arange(len(token_sets)), lengths)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.float32), (rows, cols)),
+        shape=(len(token_sets), FEATURE_DIM)
+    )
+    # Tokens hashed into the same bucket count once
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    counts = np.diff(matrix.indptr)
+    matrix.data /= np.repeat(np.sqrt(np.maximum(counts, 1)), counts).astype(np.float32)
+    return matrix
+
+
+def score_candidates(viewer_vector, matrix):
+    """Cosine similarity of the viewer against every candidate row"""
+    return np.asarray(matrix @ viewer_vector).ravel()
+
+
+def rank_candidates(viewer_vector, candidate_ids, matrix, limit=None, rows=None):
+    """
+    Order candidate ids by compatibility with the viewer, best first.
+
+    ``matrix`` holds the candidates' feature rows in order, or, with
+    ``rows``, a whole pool's rows of which ``rows`` are the candidates'.
+    Scoring the whole cached pool and picking scores out is cheaper than
+    slicing a sparse matrix. Ties keep the incoming order of
+    ``candidate_ids``.
+    """
+    if not candidate_ids:
+        return []
+    scores = score_candidates(viewer_vector, matrix)
+    if rows is not None:
+        scores = scores[rows]
+    if limit is not None and limit < len(candidate_ids):
+        # Only fully sort the top ``limit`` scores
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        order = top[np.lexsort((top, -scores[top]))]
+    else:
+        order = np.argsort(-scores, kind='stable')
+    return [candidate_ids[index] for index in order]
@@ -0,0 +1,136 @@
+"""
+Per-user "already seen" index.
+
+Every user id someone has swiped on is kept in a ``SeenSet`` row as a sorted,
+packed uint32 array. Swipe writes merge new ids into it in the same
+transaction, and the feed loads it with a single primary-key read and filters
+candidates with in-memory binary searches instead of a growing SQL
+``NOT IN (...)`` over the ``Swipe`` table.
+"""
+import logging
+import sys
+from array import array
+from bisect import bisect_left
+
+from django.db.models import F
+from django.utils import timezone
+
+from .cold import load_archived
+from .models import Swipe, SeenSet
+
+logger = logging.getLogger(__name__)
+
+MAX_UPDATE_ATTEMPTS = 5
+
+
+def pack_ids(ids):
+    """Pack a sorted iterable of ids into little-endian uint32 bytes"""
+    packed = array('I', ids)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ids(data):
+    """Unpack bytes produced by ``pack_ids`` into an ``array('I')``"""
+    ids = array('I')
+    ids.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+class SeenIds:
+    """Sorted id array with O(log n) membership tests"""
+
+    def __init__(self, ids=None):
+        self._ids = ids if ids is not None else array('I')
+
+    def __contains__(self, pk):
+        index = bisect_left(self._ids, pk)
+        return index < len(self._ids) and self._ids[index] == pk
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    @property
+    def nbytes(self):
+        return len(self._ids) * self._ids.itemsize
+
+
+def load_seen(user_id):
+    """Load the set of user ids ``user_id`` has already swiped on"""
+    data = SeenSet.objects.filter(user_id=user_id).values_list('data', flat=True).first()
+    if data is None:
+        return SeenIds()
+    return SeenIds(unpack_ids(data))
+
+
+def load_seen_many(user_ids):
+    """Load several users' seen sets with one query, keyed by user id"""
+    return {
+        user_id: SeenIds(unpack_ids(data))
+        for user_id, data in SeenSet.objects.filter(user_id__in=user_ids).values_list('user_id', 'data')
+    }
+
+
+def add_seen(user_id, swiped_user_ids):
+    """
+    Merge newly swiped user ids into ``user_id``'s seen set.
+
+    Returns the ids that were already in the set (i.e. re-swipes).
+    """
+    swiped_user_ids = list(swiped_user_ids)
+    for _ in range(MAX_UPDATE_ATTEMPTS):
+        seen_set, created = SeenSet.objects.get_or_create(user_id=user_id)
+        ids = unpack_ids(seen_set.data)
+        already_seen = []
+        for pk in swiped_user_ids:
+            index = bisect_left(ids, pk)
+            if index < len(ids) and ids[index] == pk:
+                already_seen.append(pk)
+            else:
+                ids.insert(index, pk)
+        if len(already_seen) == len(swiped_user_ids):
+            return already_seen
+
+        updated = SeenSet.objects.filter(
+            user_id=user_id,
+            version=seen_set.version
+        ).update(
+            data=pack_ids(ids),
+            size=len(ids),
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+        if updated:
+            return already_seen
+
+    # Too much contention on this row; fall back to the source of truth
+    logger.warning("Seen set for user %s kept changing; rebuilding from swipes", user_id)
+    rebuild_seen(user_id)
+    return already_seen
+
+
+def rebuild_seen(user_id):
+    """Regenerate one user's seen set from hot and archived swipes"""
+    ids = set(
+        Swipe.objects.filter(swiper_id=user_id).order_by().values_list('swiped_user_id', flat=True)
+    )
+    ids.update(entry.swiped_user_id for entry in load_archived(user_id))
+    ids = sorted(ids)
+    updated = SeenSet.objects.filter(user_id=user_id).update(
+        data=pack_ids(ids),
+        size=len(ids),
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        SeenSet.objects.get_or_create(
+            user_id=user_id,
+            defaults={'data': pack_ids(ids), 'size': len(ids)}
+        )
+    return len(ids)
@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import Swipe, Match, FullConnection
+from django.conf import settings
+from accounts.models import User
+from .models import Swipe, Match
+from .services import record_swipes
+from profiles.models import UserProfile
 from profiles.serializers import UserProfileSerializer, SwipeProfileSerializer
 from accounts.serializers import UserSerializer
 
@@ -27,39 +31,42 @@ class SwipeCreateSerializer(serializers.ModelSerializer):
         return value
     
     def create(self, validated_data):
-        """Create swipe and check for match"""
+        """Create or update swipe and create a match on a mutual wave"""
         swiper = self.context['request'].user
         swiped_user = validated_data['swiped_user']
-        action = validated_data['action']
+        record_swipes(swiper, [(swiped_user.id, validated_data['action'])])
+        return Swipe.objects.select_related('swiped_user__profile').get(swiper=swiper, swiped_user=swiped_user)
+
+
+class SwipeActionSerializer(serializers.Serializer):
+    """Serializer for one swipe in a batch"""
+    swiped_user = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=Swipe.SWIPE_CHOICES)
+
+
+class SwipeBatchSerializer(serializers.Serializer):
+    """Serializer for a batch of swipes"""
+    swipes = SwipeActionSerializer(many=True, allow_empty=False, max_length=settings.SWIPE_BATCH_MAX_SIZE)
+    
+    def validate_swipes(self, value):
+        """Validate that every swiped user exists and isn't the swiper"""
+        swiper = self.context['request'].user
+        swiped_ids = {item['swiped_user'] for item in value}
+        if swiper.id in swiped_ids:
+            raise serializers.ValidationError("You cannot swipe on yourself")
         
-        # Create or update swipe
-        swipe, created = Swipe.objects.get_or_create(
-            swiper=swiper,
-            swiped_user=swiped_user,
-            defaults={'action': action}
+        found = set(User.objects.filter(id__in=swiped_ids).values_list('id', flat=True))
+        missing = swiped_ids - found
+        if missing:
+            raise serializers.ValidationError(f"Unknown users: {sorted(missing)}")
+        return value
+    
+    def save(self):
+        """Record all swipes and return the matches they created"""
+        return record_swipes(
+            self.context['request'].user,
+            [(item['swiped_user'], item['action']) for item in self.validated_data['swipes']]
         )
-        
-        if not created:
-            swipe.action = action
-            swipe.save()
-        
-        # Check for mutual wave (match)
-        if action == 'wave':
-            try:
-                reverse_swipe = Swipe.objects.get(
-                    swiper=swiped_user,
-                    swiped_user=swiper,
-                    action='wave'
-                )
-                # Create match if it doesn't exist
-                Match.objects.get_or_create(
-                    user1=min(swiper, swiped_user, key=lambda u: u.id),
-                    user2=max(swiper, swiped_user, key=lambda u: u.id)
-                )
-            except Swipe.DoesNotExist:
-                pass  # No mutual wave yet
-        
-        return swipe
 
 
 class MatchSerializer(serializers.ModelSerializer):
@@ -94,38 +101,25 @@ class MatchSerializer(serializers.ModelSerializer):
             return None
 
 
-class FullConnectionSerializer(serializers.ModelSerializer):
-    """Serializer for full connections"""
-    match = MatchSerializer(read_only=True)
+class MatchCardSerializer(serializers.ModelSerializer):
+    """Compact serializer for matches: only the other user's card"""
+    other_user = serializers.SerializerMethodField()
     
     class Meta:
-        model = FullConnection
-        fields = (
-            'id', 'match', 'user1_confirmed', 'user2_confirmed',
-            'created_at', 'completed_at'
-        )
-        read_only_fields = ('id', 'created_at', 'completed_at')
+        model = Match
+        fields = ('id', 'other_user', 'is_fully_connected', 'created_at', 'fully_connected_at')
+        read_only_fields = fields
     
-    def create(self, validated_data):
-        """Create or update full connection"""
-        match = validated_data['match']
-        user = self.context['request'].user
-        
-        # Get or create full connection
-        full_connection, created = FullConnection.objects.get_or_create(
-            match=match,
-            defaults={
-                'user1_confirmed': False,
-                'user2_confirmed': False
-            }
-        )
-        
-        # Update the appropriate user's confirmation
-        if user == match.user1:
-            full_connection.user1_confirmed = True
-        elif user == match.user2:
-            full_connection.user2_confirmed = True
+    def get_other_user(self, obj):
+        """Get the other user's swipe card with their primary picture"""
+        other_user = obj.get_other_user(self.context['request'].user)
+        try:
+            profile = other_user.profile
+        except UserProfile.DoesNotExist:
+            return {'id': other_user.id}
         
-        full_connection.save()
-        return full_connection
-
+        card = SwipeProfileSerializer(profile).data
+        # Pictures are ordered primary-first
+        pictures = profile.pictures.all()
+        card['primary_picture'] = pictures[0].image.url if pictures else None
+        return card
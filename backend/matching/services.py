@@ -0,0 +1,159 @@
+"""
+Write paths for swipes and matches.
+
+Two users waving at each other at the same moment is the interesting case:
+each transaction inserts its own swipe and then looks for the reverse one,
+and under READ COMMITTED neither sees the other's uncommitted insert, so the
+match would be lost. ``record_swipes`` therefore locks the user rows involved
+in any wave (in id order, so concurrent batches cannot deadlock) before
+writing. The second transaction waits for the first to commit and is then
+guaranteed to see its swipe. SQLite already serializes writers, so no row
+lock is needed there. Match inserts ignore unique conflicts, so a duplicate
+can never surface as an IntegrityError.
+
+The same transaction maintains ``PendingWave``, the index of waves nobody has
+answered yet, which the deck builder reads to surface likely matches. A wave
+counts as answered when the other user has a hot swipe on the swiper or has
+the swiper in their seen set, which also covers skips already compacted into
+the cold archive (see ``matching.cold``).
+
+Full-connection confirmations have the same shape of race: both users confirm
+at once and each sees the other's side as unconfirmed. Each confirmation
+therefore sets its own side with one upsert, which takes the row lock, and
+only then checks for completion with a conditional update, so exactly one of
+the two transactions completes the connection.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+from .cold import drop_archived
+from .models import Swipe, Match, FullConnection, PendingWave
+from .seen import add_seen, load_seen_many
+from .signals import matches_created
+
+
+def _lock_users(user_ids):
+    """Take row locks on the given users for the rest of the transaction"""
+    if connection.features.has_select_for_update:
+        list(
+            User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values_list('id', flat=True)
+        )
+
+
+def record_swipes(swiper, actions):
+    """
+    Record a batch of swipes and create any matches they complete.
+
+    ``actions`` is an iterable of ``(swiped_user_id, action)`` pairs; if a
+    user appears more than once the last action wins. Swipes are written with
+    one bulk upsert, reciprocal waves are found with one query and all new
+    matches are inserted in bulk. Returns the list of newly created matches.
+    """
+    latest = {}
+    for swiped_user_id, action in actions:
+        if swiped_user_id != swiper.id:
+            latest[swiped_user_id] = action
+    if not latest:
+        return []
+
+    waved_ids = [pk for pk, action in latest.items() if action == 'wave']
+
+    with transaction.atomic():
+        if waved_ids:
+            _lock_users([swiper.id] + waved_ids)
+
+        Swipe.objects.bulk_create(
+            [
+                Swipe(swiper=swiper, swiped_user_id=swiped_user_id, action=action)
+                for swiped_user_id, action in latest.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['swiper', 'swiped_user'],
+            update_fields=['action']
+        )
+        reswiped = add_seen(swiper.id, latest.keys())
+        if reswiped:
+            # The new hot row supersedes any archived skip for the same pair
+            drop_archived(swiper.id, reswiped)
+
+        # Keep the inbound-wave index current: waves the swiper has now
+        # answered are resolved, and waves taken back are withdrawn
+        answered = Q(recipient=swiper, sender_id__in=latest.keys())
+        skipped_ids = [pk for pk, action in latest.items() if action == 'skip']
+        if skipped_ids:
+            answered |= Q(sender=swiper, recipient_id__in=skipped_ids)
+        PendingWave.objects.filter(answered).delete()
+
+        if not waved_ids:
+            return []
+
+        # How the users waved at in this batch have already swiped the swiper
+        responses = dict(Swipe.objects.filter(
+            swiper_id__in=waved_ids,
+            swiped_user=swiper
+        ).values_list('swiper_id', 'action'))
+        unanswered = [pk for pk in waved_ids if pk not in responses]
+        if unanswered:
+            # Only skips are ever compacted out of the hot table, so someone
+            # whose seen set has the swiper but no hot row skipped them long ago
+            for pk, seen in load_seen_many(unanswered).items():
+                if swiper.id in seen:
+                    responses[pk] = 'skip'
+        PendingWave.objects.bulk_create(
+            [
+                PendingWave(recipient_id=pk, sender=swiper)
+                for pk in waved_ids if pk not in responses
+            ],
+            ignore_conflicts=True
+        )
+
+        mutual_ids = {pk for pk, action in responses.items() if action == 'wave'}
+        if not mutual_ids:
+            return []
+
+        pairs = {(min(swiper.id, pk), max(swiper.id, pk)) for pk in mutual_ids}
+        pair_filter = Q(user1=swiper, user2__in=mutual_ids) | Q(user2=swiper, user1__in=mutual_ids)
+        existing = set(Match.objects.filter(pair_filter).values_list('user1_id', 'user2_id'))
+        new_pairs = pairs - existing
+        if not new_pairs:
+            return []
+
+        Match.objects.bulk_create(
+            [Match(user1_id=user1_id, user2_id=user2_id) for user1_id, user2_id in new_pairs],
+            ignore_conflicts=True
+        )
+        other_ids = [user2_id if user1_id == swiper.id else user1_id for user1_id, user2_id in new_pairs]
+        matches = list(Match.objects.filter(
+            Q(user1=swiper, user2__in=other_ids) | Q(user2=swiper, user1__in=other_ids)
+        ))
+        matches_created.send(sender=Match, matches=matches)
+        return matches
+
+
+def confirm_full_connection(user, match):
+    """
+    Record ``user``'s full-connection confirmation for ``match``.
+
+    ``match`` only needs ``id``, ``user1_id`` and ``user2_id`` loaded.
+    Returns True if this confirmation completed the connection.
+    """
+    side = 'user1_confirmed' if user.id == match.user1_id else 'user2_confirmed'
+    now = timezone.now()
+    with transaction.atomic():
+        FullConnection.objects.bulk_create(
+            [FullConnection(match_id=match.id, **{side: True})],
+            update_conflicts=True,
+            unique_fields=['match'],
+            update_fields=[side]
+        )
+        completed = FullConnection.objects.filter(
+            match_id=match.id,
+            user1_confirmed=True,
+            user2_confirmed=True,
+            completed_at__isnull=True
+        ).update(completed_at=now)
+        if completed:
+            Match.objects.filter(id=match.id).update(is_fully_connected=True, fully_connected_at=now)
+    return bool(completed)
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by record_swipes inside its transaction with ``matches``, the list of
+# newly created Match rows (bulk inserts do not send post_save)
+matches_created = Signal()
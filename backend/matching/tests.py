@@ -0,0 +1,258 @@
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import University, User
+from . import views
+from .cold import compact_user_skips
+from .history import get_history_page
+from .models import Match, PendingWave, Swipe
+from .services import _lock_users, record_swipes
+
+
+class ConcurrentMutualWaveTests(TransactionTestCase):
+    """Mutual waves racing from many threads must create exactly one match per pair"""
+    PAIRS = 10
+    ROUNDS = 3
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(self.PAIRS * 2)
+        ])
+        self.users = list(User.objects.order_by('id'))
+        self.pairs = [(self.users[i], self.users[i + 1]) for i in range(0, len(self.users), 2)]
+
+    def swipe_concurrently(self, batches):
+        """Record every (swiper, actions) batch in its own thread, all released at once"""
+        barrier = threading.Barrier(len(batches))
+        errors = []
+
+        def swipe(swiper, actions):
+            try:
+                barrier.wait()
+                record_swipes(swiper, actions)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=swipe, args=batch) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_one_match_per_mutual_pair(self):
+        for _ in range(self.ROUNDS):
+            self.swipe_concurrently(
+                [(a, [(b.id, 'wave')]) for a, b in self.pairs] +
+                [(b, [(a.id, 'wave')]) for a, b in self.pairs]
+            )
+
+        self.assertEqual(Match.objects.count(), len(self.pairs))
+        for a, b in self.pairs:
+            self.assertEqual(Match.objects.filter(user1=a, user2=b).count(), 1)
+        self.assertFalse(PendingWave.objects.exists())
+
+    def test_batches_racing_on_shared_users(self):
+        # Every user waves at everyone else in one batch, so all batches
+        # overlap on every user
+        self.swipe_concurrently([
+            (swiper, [(other.id, 'wave') for other in self.users if other != swiper])
+            for swiper in self.users
+        ])
+
+        count = len(self.users)
+        self.assertEqual(Match.objects.count(), count * (count - 1) // 2)
+
+
+@skipUnless(connection.features.has_select_for_update, 'needs a database with row locks, e.g. PostgreSQL')
+class RowLockTests(TransactionTestCase):
+    """The row-lock path of ``record_swipes``; SQLite serializes writers instead and skips it"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(2)
+        ])
+        self.alice, self.bob = User.objects.order_by('id')
+
+    def test_wave_takes_row_locks(self):
+        with CaptureQueriesContext(connection) as queries:
+            record_swipes(self.alice, [(self.bob.id, 'wave')])
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries))
+
+    def test_wave_waits_for_locked_user(self):
+        a, b = self.alice, self.bob
+        locked = threading.Event()
+        release = threading.Event()
+        swiped = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    _lock_users([b.id])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                close_old_connections()
+
+        def wave():
+            try:
+                locked.wait(10)
+                record_swipes(a, [(b.id, 'wave')])
+                swiped.set()
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=hold_lock), threading.Thread(target=wave)]
+        for thread in threads:
+            thread.start()
+        self.assertFalse(swiped.wait(0.5))
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(swiped.is_set())
+
+
+class ArchivedSkipWaveTests(TestCase):
+    """A wave at someone whose skip of the swiper is already archived is not pending"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(3)
+        ])
+        self.alice, self.bob, self.carol = User.objects.order_by('id')
+        record_swipes(self.bob, [(self.alice.id, 'skip')])
+        compact_user_skips(self.bob.id, timezone.now() + timedelta(days=1))
+
+    def test_wave_after_archived_skip(self):
+        self.assertFalse(Swipe.objects.filter(swiper=self.bob).exists())
+        record_swipes(self.alice, [(self.bob.id, 'wave'), (self.carol.id, 'wave')])
+        self.assertEqual(
+            list(PendingWave.objects.values_list('sender_id', 'recipient_id')),
+            [(self.alice.id, self.carol.id)]
+        )
+
+    def test_compact_command_in_batches(self):
+        record_swipes(self.alice, [(self.bob.id, 'skip')])
+        record_swipes(self.carol, [(self.alice.id, 'skip'), (self.bob.id, 'skip')])
+        Swipe.objects.update(created_at=timezone.now() - timedelta(days=60))
+        out = StringIO()
+        call_command('compact_skips', batch_size=1, stdout=out)
+        self.assertFalse(Swipe.objects.exists())
+        self.assertIn('Compacted 3 skips older than 30 days for 2 users', out.getvalue())
+
+    def test_rebuild_skips_archived_answers(self):
+        record_swipes(self.alice, [(self.bob.id, 'wave'), (self.carol.id, 'wave')])
+        PendingWave.objects.all().delete()
+        call_command('rebuild_pending_waves', stdout=StringIO())
+        self.assertEqual(
+            list(PendingWave.objects.values_list('sender_id', 'recipient_id')),
+            [(self.alice.id, self.carol.id)]
+        )
+
+
+class RebuildPendingWavesTests(TestCase):
+    """Rebuilt inbound waves keep the time they were sent"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(3)
+        ])
+        self.alice, self.bob, self.carol = User.objects.order_by('id')
+
+    def test_inbox_order_after_rebuild(self):
+        record_swipes(self.bob, [(self.alice.id, 'wave')])
+        record_swipes(self.carol, [(self.alice.id, 'wave')])
+        sent_at = timezone.now() - timedelta(days=10)
+        Swipe.objects.filter(swiper=self.carol).update(created_at=sent_at)
+
+        call_command('rebuild_pending_waves', stdout=StringIO())
+
+        inbox = PendingWave.objects.filter(recipient=self.alice).order_by('-created_at')
+        self.assertEqual([wave.sender_id for wave in inbox], [self.bob.id, self.carol.id])
+        self.assertEqual(inbox.get(sender=self.carol).created_at, sent_at)
+
+
+class ExportStreamTests(TransactionTestCase):
+    """The history export streams chunk by chunk when served over ASGI"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(8)
+        ])
+        self.user, *self.others = User.objects.order_by('id')
+        record_swipes(self.user, [(other.id, 'skip') for other in self.others[:4]])
+        compact_user_skips(self.user.id, timezone.now() + timedelta(days=1))
+        record_swipes(self.user, [(other.id, 'wave') for other in self.others[4:]])
+
+    def export(self):
+        """GET the export through the ASGI handler, noting how many chunks were fetched before each body message"""
+        fetched = []
+        bodies = []
+
+        def get_history_chunk(*args):
+            fetched.append(args)
+            return original(*args)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                self.assertEqual(message['status'], 200)
+            elif message.get('body'):
+                bodies.append((message['body'], len(fetched)))
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/api/matching/swipe-history/export/',
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Bearer {AccessToken.for_user(self.user)}'.encode()),
+            ],
+            'server': ('testserver', 80),
+        }
+        original = views.get_history_chunk
+        with mock.patch.object(views, 'get_history_chunk', get_history_chunk):
+            async_to_sync(ASGIHandler())(scope, receive, send)
+        return bodies, len(fetched)
+
+    @override_settings(SWIPE_HISTORY_EXPORT_CHUNK_SIZE=2)
+    def test_streams_over_asgi(self):
+        bodies, fetched = self.export()
+
+        swipes, _ = get_history_page(self.user, page_size=100)
+        rows = [json.loads(line) for line in b''.join(body for body, _ in bodies).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [swipe.id for swipe in swipes])
+        self.assertEqual([row['action'] for row in rows], ['wave'] * 3 + ['skip'] * 4)
+        # The first rows go out before the later chunks are even fetched
+        self.assertEqual([before for _, before in bodies], [1, 2, 3, 4])
+        self.assertEqual(fetched, 4)
@@ -3,10 +3,12 @@ from . import views
 
 urlpatterns = [
     path('swipe/', views.swipe_user, name='swipe_user'),
+    path('swipe/batch/', views.swipe_batch, name='swipe_batch'),
     path('matches/', views.get_matches, name='get_matches'),
     path('matches/<int:match_id>/', views.get_match_detail, name='get_match_detail'),
     path('matches/<int:match_id>/fully-connect/', views.fully_connect, name='fully_connect'),
     path('swipe-history/', views.get_swipe_history, name='swipe_history'),
+    path('swipe-history/export/', views.export_swipe_history, name='export_swipe_history'),
     path('swipeable-profiles/', views.get_swipeable_profiles, name='swipeable_profiles'),
 ]
 
@@ -0,0 +1,81 @@
+"""
+Version stamps for conditional GETs.
+
+A stamp is a handful of aggregates over the rows a response renders, read
+in one indexed query: the user's matches, their chat summaries and read
+watermarks, and the ``updated_at`` of both users and profiles of each match.
+Every committed change to what a response shows moves at least one of them
+(a new message moves the summaries' last message, a read moves a watermark's
+``read_at``, a profile or picture edit moves the profile's ``updated_at``),
+so views hash the stamp into the ETag and answer ``If-None-Match`` with 304
+before running any of the response's own queries. The stamps come straight
+from the database, so every worker computes the same ETag for the same data
+whatever cache backend is configured.
+"""
+import hashlib
+
+from django.db.models import Count, Max, Q, Sum
+from django.utils.http import parse_etags, quote_etag
+
+from .models import Match
+
+
+def _member_stamps():
+    """Aggregates over the users and profiles of the matches being stamped"""
+    return {
+        'user1_at': Max('user1__updated_at'),
+        'user2_at': Max('user2__updated_at'),
+        'profile1_at': Max('user1__profile__updated_at'),
+        'profile2_at': Max('user2__profile__updated_at'),
+    }
+
+
+def user_version(user_id):
+    """Stamp of a user's match and chat lists"""
+    # The summary and watermark joins repeat rows, which is harmless: the
+    # stamp only has to change whenever the data does
+    stamp = Match.objects.filter(Q(user1_id=user_id) | Q(user2_id=user_id)).aggregate(
+        matches=Count('id', distinct=True),
+        last_match=Max('id'),
+        connected=Max('fully_connected_at'),
+        last_message=Max('chat_summaries__last_message_id'),
+        unread=Sum('chat_summaries__unread_count'),
+        read=Max('read_watermarks__read_at'),
+        **_member_stamps()
+    )
+    return tuple(stamp.values())
+
+
+def match_version(match_id):
+    """Stamp of a match's message history"""
+    stamp = Match.objects.filter(id=match_id).aggregate(
+        last_message=Max('chat_summaries__last_message_id'),
+        read=Max('read_watermarks__read_at'),
+        **_member_stamps()
+    )
+    # Images finish processing after they are sent; kept out of the query
+    # above so its joins don't repeat every message
+    images = Match.objects.filter(id=match_id).aggregate(
+        images=Max('messages__image_variants__processed_at')
+    )
+    return (*stamp.values(), *images.values())
+
+
+def compute_etag(request, *versions):
+    """Strong ETag for the response to ``request``, given the stamps its data depends on"""
+    raw = ':'.join(str(part) for part in (
+        request.user.id,
+        request.get_full_path(),
+        request.accepted_renderer.format,
+        *versions
+    ))
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def is_not_modified(request, etag):
+    """Whether the client's ``If-None-Match`` already holds this ETag"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
@@ -1,18 +1,40 @@
+import json
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
-from .models import Swipe, Match, FullConnection
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from channels.db import database_sync_to_async
+from .models import Swipe, Match
+from .deck import get_deck_page, InvalidCursor
+from .cold import load_archived
+from .history import get_history_chunk, get_history_page
+from .services import confirm_full_connection
+from .versions import compute_etag, is_not_modified, user_version
 from .serializers import (
     SwipeSerializer,
     SwipeCreateSerializer,
+    SwipeBatchSerializer,
     MatchSerializer,
-    FullConnectionSerializer
+    MatchCardSerializer
 )
 
 
+def with_match_details(matches):
+    """Load everything MatchSerializer renders in a constant number of queries"""
+    return matches.select_related(
+        'user1__university', 'user2__university',
+        'user1__profile', 'user2__profile'
+    ).prefetch_related(
+        'user1__profile__pictures', 'user2__profile__pictures'
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def swipe_user(request):
@@ -27,19 +49,52 @@ def swipe_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def swipe_batch(request):
+    """Record a batch of swipes and return only the matches they created"""
+    serializer = SwipeBatchSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        matches = serializer.save()
+        return Response({
+            'processed': len(serializer.validated_data['swipes']),
+            'matches': [
+                {
+                    'match_id': match.id,
+                    'user_id': match.user2_id if match.user1_id == request.user.id else match.user1_id
+                }
+                for match in matches
+            ]
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_matches(request):
-    """Get user's matches"""
+    """Get user's matches, or 304 if the client's ETag is still current"""
     user = request.user
+    etag = compute_etag(request, *user_version(user.id))
+    if is_not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    compact = request.query_params.get('compact') in ('1', 'true')
     
     # Get matches where user is either user1 or user2
     matches = Match.objects.filter(
         Q(user1=user) | Q(user2=user)
     ).order_by('-created_at')
     
-    serializer = MatchSerializer(matches, many=True, context={'request': request})
-    return Response(serializer.data)
+    if compact:
+        matches = matches.select_related(
+            'user1__profile', 'user2__profile'
+        ).prefetch_related(
+            'user1__profile__pictures', 'user2__profile__pictures'
+        )
+        serializer = MatchCardSerializer(matches, many=True, context={'request': request})
+    else:
+        matches = with_match_details(matches)
+        serializer = MatchSerializer(matches, many=True, context={'request': request})
+    return Response(serializer.data, headers={'ETag': etag})
 
 
 @api_view(['GET'])
@@ -47,7 +102,7 @@ def get_matches(request):
 def get_match_detail(request, match_id):
     """Get detailed information about a specific match"""
     try:
-        match = Match.objects.get(
+        match = with_match_details(Match.objects).get(
             Q(user1=request.user) | Q(user2=request.user),
             id=match_id
         )
@@ -63,9 +118,9 @@ def get_match_detail(request, match_id):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def fully_connect(request, match_id):
-    """Confirm full connection with a match"""
+    """Confirm full connection with a match (``?include=match`` adds the match)"""
     try:
-        match = Match.objects.get(
+        match = Match.objects.only('id', 'user1_id', 'user2_id', 'is_fully_connected').get(
             Q(user1=request.user) | Q(user2=request.user),
             id=match_id
         )
@@ -79,61 +134,120 @@ def fully_connect(request, match_id):
             'error': 'Already fully connected'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = FullConnectionSerializer(
-        data={'match': match.id},
-        context={'request': request}
-    )
+    completed = confirm_full_connection(request.user, match)
+    if completed:
+        data = {
+            'message': 'Full connection completed! You can now see all details and send pictures.',
+            'match_id': match.id,
+            'status': 'completed',
+            'is_fully_connected': True
+        }
+    else:
+        data = {
+            'message': 'Your confirmation has been recorded. Waiting for the other user to confirm.',
+            'match_id': match.id,
+            'status': 'waiting',
+            'is_fully_connected': False
+        }
     
-    if serializer.is_valid():
-        full_connection = serializer.save()
-        
-        if full_connection.is_completed():
-            return Response({
-                'message': 'Full connection completed! You can now see all details and send pictures.',
-                'match': MatchSerializer(match, context={'request': request}).data
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({
-                'message': 'Your confirmation has been recorded. Waiting for the other user to confirm.',
-                'match': MatchSerializer(match, context={'request': request}).data
-            }, status=status.HTTP_200_OK)
+    if request.query_params.get('include') == 'match':
+        match = with_match_details(Match.objects.filter(id=match.id)).get()
+        data['match'] = MatchSerializer(match, context={'request': request}).data
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_swipe_history(request):
-    """Get user's swipe history"""
-    swipes = Swipe.objects.filter(swiper=request.user).order_by('-created_at')
+    """Get one keyset-paginated page of the user's swipe history"""
+    try:
+        page_size = int(request.query_params.get('page_size', settings.SWIPE_HISTORY_PAGE_SIZE))
+    except ValueError:
+        page_size = 0
+    if not 1 <= page_size <= settings.SWIPE_HISTORY_MAX_PAGE_SIZE:
+        return Response({
+            'error': f'page_size must be between 1 and {settings.SWIPE_HISTORY_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        swipes, next_cursor = get_history_page(
+            request.user,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size
+        )
+    except InvalidCursor:
+        return Response({
+            'error': 'Invalid cursor'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     serializer = SwipeSerializer(swipes, many=True)
-    return Response(serializer.data)
+    return Response({
+        'next_cursor': next_cursor,
+        'results': serializer.data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_swipe_history(request):
+    """Stream the user's whole swipe history as newline-delimited JSON"""
+    user = request.user
+    
+    def render_chunk(archived, after):
+        swipes, after = get_history_chunk(user, archived, after, settings.SWIPE_HISTORY_EXPORT_CHUNK_SIZE)
+        return ''.join(
+            json.dumps(SwipeSerializer(swipe).data, cls=DjangoJSONEncoder) + '\n' for swipe in swipes
+        ), after
+    
+    async def rows():
+        # An async iterator, since ASGI reads a sync one into a list up front
+        archived = await database_sync_to_async(load_archived)(user.id)
+        chunk, after = await database_sync_to_async(render_chunk)(archived, None)
+        yield chunk
+        while after is not None:
+            chunk, after = await database_sync_to_async(render_chunk)(archived, after)
+            yield chunk
+    
+    response = StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="swipe-history.ndjson"'
+    return response
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_swipeable_profiles(request):
-    """Get profiles that can be swiped on"""
+    """Get the next page of the user's precomputed swipe deck"""
     from profiles.models import UserProfile
     
     try:
-        current_profile = request.user.profile
+        request.user.profile
     except UserProfile.DoesNotExist:
         return Response({
             'error': 'Profile not found. Please create your profile first.'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # Get users already swiped by current user
-    swiped_user_ids = Swipe.objects.filter(swiper=request.user).values_list('swiped_user_id', flat=True)
+    try:
+        page_size = int(request.query_params.get('page_size', settings.SWIPE_DECK_PAGE_SIZE))
+    except ValueError:
+        page_size = 0
+    if not 1 <= page_size <= settings.SWIPE_DECK_MAX_PAGE_SIZE:
+        return Response({
+            'error': f'page_size must be between 1 and {settings.SWIPE_DECK_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get profiles of same year, excluding current user and already swiped users
-    profiles = UserProfile.objects.filter(
-        year=current_profile.year
-    ).exclude(
-        user__in=[request.user.id] + list(swiped_user_ids)
-    )
+    try:
+        cards, next_cursor = get_deck_page(
+            request.user,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size
+        )
+    except InvalidCursor:
+        return Response({
+            'error': 'Invalid cursor'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    from profiles.serializers import SwipeProfileSerializer
-    serializer = SwipeProfileSerializer(profiles, many=True)
-    return Response(serializer.data)
-
+    return Response({
+        'next_cursor': next_cursor,
+        'results': cards
+    })
@@ -1,21 +1,57 @@
 from django.contrib import admin
-from .models import Message, MessageReadStatus
+from .models import Message, ReadWatermark, ChatSummary, UnreadCounter, MessageImage, ArchivedMessageSegment
+from .search import filter_messages
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('sender', 'match', 'message_type', 'created_at', 'is_read')
-    list_filter = ('message_type', 'is_read', 'created_at')
-    search_fields = ('sender__university_email', 'content')
-    readonly_fields = ('created_at', 'read_at')
+    list_display = ('sender', 'match', 'message_type', 'created_at')
+    list_filter = ('message_type', 'created_at')
+    search_fields = ('sender__university_email',)
+    readonly_fields = ('created_at',)
     ordering = ('-created_at',)
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Search senders by email, and message content through the full-text index"""
+        if not search_term:
+            return queryset, False
+        by_sender, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        return by_sender | filter_messages(queryset, search_term), may_have_duplicates
 
 
-@admin.register(MessageReadStatus)
-class MessageReadStatusAdmin(admin.ModelAdmin):
-    list_display = ('user', 'message', 'is_read', 'read_at')
-    list_filter = ('is_read', 'read_at')
-    search_fields = ('user__university_email', 'message__content')
+@admin.register(ReadWatermark)
+class ReadWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('user', 'match', 'last_read_message_id', 'read_at')
+    search_fields = ('user__university_email',)
     readonly_fields = ('read_at',)
-    ordering = ('-message__created_at',)
+    ordering = ('-read_at',)
 
+
+@admin.register(ChatSummary)
+class ChatSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'match', 'unread_count', 'last_activity_at')
+    search_fields = ('user__university_email', 'other_user__university_email')
+    raw_id_fields = ('last_message',)
+    ordering = ('-last_activity_at',)
+
+
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'count')
+    search_fields = ('user__university_email',)
+
+
+@admin.register(MessageImage)
+class MessageImageAdmin(admin.ModelAdmin):
+    list_display = ('message', 'status', 'width', 'height', 'processed_at')
+    list_filter = ('status',)
+    raw_id_fields = ('message',)
+    readonly_fields = ('processed_at',)
+
+
+@admin.register(ArchivedMessageSegment)
+class ArchivedMessageSegmentAdmin(admin.ModelAdmin):
+    list_display = ('match', 'first_message_id', 'last_message_id', 'message_count', 'created_at')
+    raw_id_fields = ('match',)
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
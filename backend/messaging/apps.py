@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_search_index(sender, using, **kwargs):
+    """Create the full-text message index after migrate, indexing existing messages the first time"""
+    from .search import install_search_index, rebuild_search_index
+    if install_search_index(using):
+        rebuild_search_index(using)
 
 
 class MessagingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'messaging'
-
+    
+    def ready(self):
+        from . import checks, signals
+        post_migrate.connect(create_search_index, sender=self)
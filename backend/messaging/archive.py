@@ -0,0 +1,193 @@
+"""
+Archive of cold conversations.
+
+Chats where nobody has written for a while keep only their most recent
+messages in ``messaging_message``; everything older that both users have
+already read moves into ``ArchivedMessageSegment`` rows, blocks of
+consecutive messages stored as zlib-compressed JSON. Messages keep their
+ids, so the keyset cursors of the message list carry on into the archive
+when a user scrolls past the hot messages, and unread counts and read
+receipts are unaffected. Archived messages drop out of full-text search
+until they are restored.
+
+``archive_cold_chats`` runs the job and ``restore_archived_messages``
+moves segments back into the message table.
+"""
+import json
+import zlib
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Min
+
+from accounts.models import User
+from .models import ArchivedMessageSegment, Message, MessageImage, ReadWatermark
+
+
+def _encode_datetime(value):
+    return value.isoformat() if value else None
+
+
+def _decode_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def encode_segment(messages):
+    """Compress messages, with their image variants, into a segment payload"""
+    rows = []
+    for message in messages:
+        row = {
+            'id': message.id,
+            'sender': message.sender_id,
+            'message_type': message.message_type,
+            'content': message.content,
+            'image': message.image.name or '',
+            'created_at': _encode_datetime(message.created_at),
+        }
+        variants = getattr(message, 'image_variants', None)
+        if variants is not None:
+            row['image_variants'] = {
+                'status': variants.status,
+                'placeholder': variants.placeholder,
+                'thumbnail': variants.thumbnail.name or '',
+                'width': variants.width,
+                'height': variants.height,
+                'processed_at': _encode_datetime(variants.processed_at),
+            }
+        rows.append(row)
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 9)
+
+
+def decode_segment(data, match):
+    """
+    Rebuild a segment's messages, oldest first, as unsaved Message instances
+    of ``match`` with their image variants attached.
+    """
+    messages = []
+    for row in json.loads(zlib.decompress(bytes(data))):
+        variants = row.pop('image_variants', None)
+        message = Message(
+            match=match,
+            sender_id=row.pop('sender'),
+            created_at=_decode_datetime(row.pop('created_at')),
+            **row
+        )
+        if variants is not None:
+            variants['processed_at'] = _decode_datetime(variants['processed_at'])
+            message.image_variants = MessageImage(**variants)
+        else:
+            # Cache the missing variants so reading them does not hit the database
+            Message.image_variants.related.set_cached_value(message, None)
+        messages.append(message)
+    return messages
+
+
+def archive_match(match, keep_recent=50, segment_size=500):
+    """
+    Move a match's messages into archive segments, except the newest
+    ``keep_recent`` ones, anything either user has not read yet and
+    anything from a pending image upload onwards. Returns the number of
+    messages archived.
+    """
+    with transaction.atomic():
+        messages = Message.objects.filter(match=match)
+        keep_from = messages.order_by('-id').values_list('id', flat=True)[keep_recent - 1:keep_recent].first()
+        watermarks = dict(ReadWatermark.objects.filter(match=match).values_list('user_id', 'last_read_message_id'))
+        pending_from = messages.filter(image_variants__status='pending').aggregate(first=Min('id'))['first']
+        limits = [
+            keep_from - 1 if keep_from else 0,
+            watermarks.get(match.user1_id, 0),
+            watermarks.get(match.user2_id, 0),
+        ]
+        if pending_from:
+            limits.append(pending_from - 1)
+        last_id = min(limits)
+        if last_id <= 0:
+            return 0
+
+        to_archive = messages.filter(id__lte=last_id).select_related('image_variants').order_by('id')
+        segments = []
+        block = []
+        for message in to_archive.iterator(chunk_size=segment_size):
+            block.append(message)
+            if len(block) == segment_size:
+                segments.append(block)
+                block = []
+        if block:
+            segments.append(block)
+        if not segments:
+            return 0
+
+        ArchivedMessageSegment.objects.bulk_create([
+            ArchivedMessageSegment(
+                match=match,
+                first_message_id=block[0].id,
+                last_message_id=block[-1].id,
+                message_count=len(block),
+                data=encode_segment(block)
+            )
+            for block in segments
+        ])
+        # Deleting the messages also deletes their MessageImage rows
+        messages.filter(id__lte=segments[-1][-1].id).delete()
+        return sum(len(block) for block in segments)
+
+
+def read_archive(match, before=None, limit=50):
+    """
+    Get up to ``limit`` archived messages of ``match`` older than
+    ``before``, newest first, as unsaved Message instances.
+    """
+    segments = ArchivedMessageSegment.objects.filter(match=match)
+    if before is not None:
+        segments = segments.filter(first_message_id__lt=before)
+    messages = []
+    for segment in segments.order_by('-last_message_id').iterator(chunk_size=2):
+        for message in reversed(decode_segment(segment.data, match)):
+            if before is None or message.id < before:
+                messages.append(message)
+                if len(messages) == limit:
+                    return messages
+    return messages
+
+
+def fill_from_archive(match, page, cursors, before, page_size):
+    """
+    Top up a backwards page of ``get_message_page`` that reached the oldest
+    hot message with archived messages, and point its ``before`` cursor
+    into the archive while there are more.
+    """
+    boundary = page[-1].id if page else before
+    needed = page_size - len(page)
+    if not needed:
+        if ArchivedMessageSegment.objects.filter(match=match, first_message_id__lt=boundary).exists():
+            cursors['before'] = boundary
+        return page, cursors
+
+    older = read_archive(match, before=boundary, limit=needed + 1)
+    if older:
+        senders = User.objects.select_related('university', 'profile').in_bulk([match.user1_id, match.user2_id])
+        for message in older:
+            message.sender = senders[message.sender_id]
+        page = page + older[:needed]
+        cursors['before'] = page[-1].id if len(older) > needed else None
+        cursors['after'] = cursors['after'] or page[0].id
+    return page, cursors
+
+
+def restore_match(match):
+    """Move all of a match's archived messages back into the message table. Returns the count."""
+    with transaction.atomic():
+        segments = list(ArchivedMessageSegment.objects.filter(match=match).order_by('first_message_id'))
+        messages = [message for segment in segments for message in decode_segment(segment.data, match)]
+        variants = [message.image_variants for message in messages if hasattr(message, 'image_variants')]
+        # bulk_create keeps the explicit ids; created_at is restored afterwards
+        # because auto_now_add would overwrite it
+        created_at = {message.id: message.created_at for message in messages}
+        Message.objects.bulk_create(messages, batch_size=500)
+        for message in messages:
+            message.created_at = created_at[message.id]
+        Message.objects.bulk_update(messages, ['created_at'], batch_size=500)
+        MessageImage.objects.bulk_create(variants, batch_size=500)
+        ArchivedMessageSegment.objects.filter(id__in=[segment.id for segment in segments]).delete()
+        return len(messages)
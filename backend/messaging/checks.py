@@ -0,0 +1,43 @@
+"""
+System checks for the messaging schema.
+
+Read state moved from ``Message.is_read``/``read_at`` to ``ReadWatermark``.
+``syncdb`` does not alter existing tables, so databases built before that
+keep both columns, ``NOT NULL`` without a default, until
+``convert_read_statuses`` drops them; until then every send fails.
+``migrate`` runs this check against the database it migrates.
+"""
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+LEGACY_MESSAGE_COLUMNS = ('is_read', 'read_at')
+
+
+def legacy_read_columns(using='default'):
+    """Get the old read-state columns still on the message table"""
+    from .models import Message
+    connection = connections[using]
+    table = Message._meta.db_table
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return []
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    return [column for column in LEGACY_MESSAGE_COLUMNS if column in columns]
+
+
+@register(Tags.database)
+def check_legacy_read_columns(app_configs, databases=None, **kwargs):
+    """Warn about databases whose message table still has the old read-state columns"""
+    warnings = []
+    for using in databases or []:
+        columns = legacy_read_columns(using)
+        if columns:
+            warnings.append(
+                Warning(
+                    f"messaging_message still has the legacy columns {', '.join(columns)}, "
+                    "so sending messages fails.",
+                    hint="Run `python manage.py convert_read_statuses` before serving traffic.",
+                    id='messaging.W001',
+                )
+            )
+    return warnings
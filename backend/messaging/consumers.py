@@ -0,0 +1,31 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .events import user_group
+
+# Close code for sockets opened without a valid access token
+UNAUTHORIZED = 4401
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """Push new messages, read receipts and new matches to a signed-in user"""
+    
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=UNAUTHORIZED)
+            return
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+    
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content, **kwargs):
+        """The socket is push-only; answer pings so clients can keep it alive"""
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+    
+    async def chat_event(self, event):
+        await self.send_json(event['payload'])
@@ -0,0 +1,83 @@
+"""
+Per-user unread badge counters.
+
+``UnreadCounter`` holds each user's total of unread messages. It is
+incremented when a message is sent to the user and decremented by the
+chat's unread count when they mark it read, in the same transaction as the
+chat summary update. Reads go through the cache, which is cleared when the
+transaction commits, so badge polling does not hit the database at all.
+Other workers only see the clear through a shared cache (see
+``matching.checks``); a per-process cache keeps their badge for up to
+``UNREAD_COUNT_CACHE_TIMEOUT``.
+``repair_unread_counters`` reconciles the counters with the read statuses.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import UnreadCounter
+
+UNREAD_COUNT_KEY = 'unread_count:{user_id}'
+
+
+def _invalidate(user_id):
+    key = UNREAD_COUNT_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def lock_counter(user_id):
+    """
+    Lock a user's counter row for the rest of the transaction, creating it
+    if needed. Everything that changes a user's unread state takes this lock
+    first, so concurrent sends and read marks are applied one at a time.
+    """
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id)], ignore_conflicts=True)
+    if connection.features.has_select_for_update:
+        list(UnreadCounter.objects.select_for_update().filter(user_id=user_id).values_list('user_id', flat=True))
+
+
+def increment_unread(user_id, amount=1):
+    """Add newly received messages to a user's badge"""
+    UnreadCounter.objects.filter(user_id=user_id).update(count=F('count') + amount)
+    _invalidate(user_id)
+
+
+def add_unread(user_id, amount=1):
+    """
+    Add newly received messages to a user's badge, creating the counter if
+    needed. On SQLite and PostgreSQL this is a single upsert, which also
+    holds the row lock for the rest of the transaction like ``lock_counter``.
+    """
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        lock_counter(user_id)
+        increment_unread(user_id, amount)
+        return
+    table = connection.ops.quote_name(UnreadCounter._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, count) VALUES (%s, %s) "
+            f"ON CONFLICT (user_id) DO UPDATE SET count = {table}.count + excluded.count",
+            [user_id, amount]
+        )
+    _invalidate(user_id)
+
+
+def decrement_unread(user_id, amount):
+    """Take messages that were just read off a user's badge"""
+    if amount:
+        UnreadCounter.objects.filter(user_id=user_id).update(
+            count=Greatest(F('count') - amount, Value(0))
+        )
+        _invalidate(user_id)
+
+
+def cached_unread_count(user_id):
+    """Get a user's unread badge count, from the cache when possible"""
+    key = UNREAD_COUNT_KEY.format(user_id=user_id)
+    count = cache.get(key)
+    if count is None:
+        count = UnreadCounter.objects.filter(user_id=user_id).values_list('count', flat=True).first() or 0
+        cache.set(key, count, settings.UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
@@ -0,0 +1,94 @@
+"""
+Real-time events pushed to connected clients.
+
+Every user's WebSocket connections join the channel-layer group
+``user.<id>`` (see ``messaging.consumers``). Write paths call the helpers
+below inside their transaction and the event is published once it commits,
+so clients never hear about rows that were rolled back. With the in-memory
+layer events only reach sockets served by the same process; configure a
+shared layer (Redis) in ``CHANNEL_LAYERS`` when running several workers.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def user_group(user_id):
+    """Name of the channel-layer group a user's sockets join"""
+    return f'user.{user_id}'
+
+
+def _publish(user_ids, payload):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for user_id in user_ids:
+        async_to_sync(channel_layer.group_send)(user_group(user_id), {
+            'type': 'chat.event',
+            'payload': payload,
+        })
+
+
+def publish(user_ids, payload):
+    """Send ``payload`` to every socket of the given users once the transaction commits"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _publish(user_ids, payload))
+
+
+def message_payload(message):
+    """Lean representation of a message for pushes and polls"""
+    return {
+        'id': message.id,
+        'sender': message.sender_id,
+        'message_type': message.message_type,
+        'content': message.content,
+        'image': message.image.url if message.image else None,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def message_created(message, match):
+    """Push a new message to both participants"""
+    publish((match.user1_id, match.user2_id), {
+        'type': 'message.new',
+        'match_id': match.id,
+        'message': message_payload(message),
+    })
+
+
+def image_processed(message, variants):
+    """Push the variants of a processed image message, or its rejection, to both participants"""
+    match = message.match
+    publish((match.user1_id, match.user2_id), {
+        'type': 'message.image',
+        'match_id': match.id,
+        'message_id': message.id,
+        'status': variants.status,
+        'image': message.image.url if variants.status == 'ready' else None,
+        'thumbnail': variants.thumbnail.url if variants.thumbnail else None,
+        'placeholder': variants.placeholder,
+        'width': variants.width,
+        'height': variants.height,
+    })
+
+
+def chat_read(user, match, last_read_message_id, read_at):
+    """Push a read receipt to both participants"""
+    publish((match.user1_id, match.user2_id), {
+        'type': 'message.read',
+        'match_id': match.id,
+        'user_id': user.id,
+        'last_read_message_id': last_read_message_id,
+        'read_at': read_at.isoformat(),
+    })
+
+
+def matches_created(matches):
+    """Tell both users of each new match about it"""
+    for match in matches:
+        for user_id, other_user_id in ((match.user1_id, match.user2_id), (match.user2_id, match.user1_id)):
+            publish((user_id,), {
+                'type': 'match.new',
+                'match_id': match.id,
+                'user_id': other_user_id,
+            })
@@ -0,0 +1,41 @@
+"""
+Message history reads.
+
+A chat's messages are paginated by id with ``before``/``after`` keysets on
+the ``(match, id)`` index, newest first, so fetching older history costs the
+same however far back the client has scrolled and no page runs a COUNT(*).
+Every page also returns the ids to pass back as ``before`` (older history)
+and ``after`` (polling for anything newer).
+"""
+
+
+def get_message_page(messages, before=None, after=None, page_size=50):
+    """
+    Get one page of a chat's messages, newest first.
+
+    ``messages`` is the chat's Message queryset. With ``before`` only older
+    messages are returned; with ``after`` the page holds the messages right
+    after that id, for catching up. Returns ``(page, cursors)``, where
+    ``cursors`` has ``before`` (None once the start of the chat is reached),
+    ``after`` (None for an empty page without ``after``) and ``has_newer``.
+    """
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+
+    if after is not None:
+        page = list(messages.filter(id__gt=after).order_by('id')[:page_size + 1])
+        has_newer = len(page) > page_size
+        page = page[:page_size][::-1]
+        has_older = after > 0
+    else:
+        page = list(messages.order_by('-id')[:page_size + 1])
+        has_older = len(page) > page_size
+        page = page[:page_size]
+        has_newer = before is not None
+
+    cursors = {
+        'before': page[-1].id if page and has_older else None,
+        'after': page[0].id if page else after,
+        'has_newer': has_newer,
+    }
+    return page, cursors
@@ -0,0 +1,154 @@
+"""
+Message image pipeline.
+
+Sending an image only stores the raw upload and a pending ``MessageImage``;
+the request returns right away. A small background worker pool then
+validates the upload, applies its EXIF orientation, re-encodes it without
+metadata and writes the variants: a display-size JPEG (the message's
+``image``), a thumbnail and a tiny blurred placeholder inlined as a data URI.
+Both users get a ``message.image`` event when the variants are ready or the
+upload was rejected. ``process_message_images`` picks up uploads that were
+left pending, e.g. by a restart.
+"""
+import base64
+import io
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+from . import events
+from .models import Message, MessageImage
+
+logger = logging.getLogger(__name__)
+
+_image_executor = ThreadPoolExecutor(
+    max_workers=settings.MESSAGE_IMAGE_WORKERS,
+    thread_name_prefix='message-image'
+)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+
+class InvalidImage(ValueError):
+    """Raised when an upload is not an image we accept"""
+
+
+def queue_image(message, upload):
+    """Store the raw upload of a new image message and process it once the transaction commits"""
+    variants = MessageImage(message=message)
+    extension = os.path.splitext(upload.name)[1].lower()
+    variants.upload.save(f"{uuid.uuid4().hex}{extension}", upload, save=False)
+    variants.save()
+    transaction.on_commit(lambda: _image_executor.submit(_process, message.id))
+    return variants
+
+
+def load_image(file):
+    """Decode an upload, upright and flattened to RGB, or raise InvalidImage"""
+    try:
+        with Image.open(file) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise InvalidImage(f"Unsupported image format {image.format}")
+            if image.width * image.height > settings.MESSAGE_IMAGE_MAX_PIXELS:
+                raise InvalidImage("Image is too large")
+            image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage("Not a valid image") from e
+
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, 'white')
+        flattened.paste(image, mask=image.getchannel('A'))
+        return flattened
+    return image.convert('RGB')
+
+
+def _encode(image, size, quality=82):
+    # Saving without exif/icc_profile arguments drops all metadata
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return image, buffer.getvalue()
+
+
+def _placeholder(image):
+    small = image.copy()
+    small.thumbnail((settings.MESSAGE_IMAGE_PLACEHOLDER_SIZE,) * 2)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def process_message_image(message_id):
+    """
+    Turn the raw upload of an image message into its variants, or mark it
+    failed if it is not an acceptable image. Returns the MessageImage.
+    """
+    variants = MessageImage.objects.select_related('message__match').get(message_id=message_id)
+    if variants.status != 'pending':
+        return variants
+    message = variants.message
+
+    try:
+        with variants.upload.open('rb') as upload:
+            image = load_image(upload)
+    except (InvalidImage, FileNotFoundError) as e:
+        logger.info("Rejected image for message %s: %s", message_id, e)
+        variants.status = 'failed'
+        written = []
+    else:
+        name = uuid.uuid4().hex
+        display, data = _encode(image, settings.MESSAGE_IMAGE_DISPLAY_SIZE)
+        message.image.save(f"{name}.jpg", ContentFile(data), save=False)
+        _, data = _encode(image, settings.MESSAGE_IMAGE_THUMBNAIL_SIZE)
+        variants.thumbnail.save(f"{name}.jpg", ContentFile(data), save=False)
+        variants.placeholder = _placeholder(image)
+        variants.width, variants.height = display.size
+        variants.status = 'ready'
+        written = [message.image, variants.thumbnail]
+
+    upload = variants.upload.name
+    variants.upload = ''
+    variants.processed_at = timezone.now()
+    with transaction.atomic():
+        # Only the first worker to finish an upload publishes its variants
+        claimed = MessageImage.objects.filter(message_id=message_id, status='pending').update(
+            status=variants.status,
+            upload='',
+            placeholder=variants.placeholder,
+            thumbnail=variants.thumbnail.name or '',
+            width=variants.width,
+            height=variants.height,
+            processed_at=variants.processed_at
+        )
+        if not claimed:
+            for file in written:
+                file.delete(save=False)
+            return MessageImage.objects.get(message_id=message_id)
+        if variants.status == 'ready':
+            Message.objects.filter(id=message_id).update(image=message.image.name)
+        events.image_processed(message, variants)
+
+    storage = MessageImage._meta.get_field('upload').storage
+    transaction.on_commit(lambda: storage.delete(upload))
+    return variants
+
+
+def _process(message_id):
+    """Background task: process one uploaded message image"""
+    close_old_connections()
+    try:
+        process_message_image(message_id)
+    except Exception:
+        logger.exception("Failed to process image for message %s", message_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from matching.models import Match
+from messaging.archive import archive_match
+from messaging.models import ChatSummary
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the older, already read messages of chats that went quiet into '
+        'compressed archive segments, keeping the most recent ones in the message table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inactive-days', type=int, default=90, help='Archive chats quiet for this many days')
+        parser.add_argument('--keep-recent', type=int, default=50, help='Messages per chat to keep in the message table')
+        parser.add_argument('--segment-size', type=int, default=500, help='Messages per archive segment')
+        parser.add_argument('--match', type=int, help='Only archive this match id, however recently it was active')
+        parser.add_argument('--batch-size', type=int, default=500, help='Matches loaded per query')
+
+    def handle(self, *args, **options):
+        if min(options['keep_recent'], options['segment_size'], options['batch_size']) < 1:
+            raise CommandError('--keep-recent, --segment-size and --batch-size must be at least 1')
+
+        if options['match']:
+            match_ids = [options['match']]
+        else:
+            cutoff = timezone.now() - timedelta(days=options['inactive_days'])
+            match_ids = list(ChatSummary.objects.filter(last_activity_at__lt=cutoff).values_list(
+                'match_id', flat=True
+            ).distinct().order_by('match_id'))
+
+        chats = messages = 0
+        # Load matches in batches so the IN clause stays under the database's
+        # limit on query parameters
+        batch_size = options['batch_size']
+        for start in range(0, len(match_ids), batch_size):
+            for match in Match.objects.filter(id__in=match_ids[start:start + batch_size]).order_by('id'):
+                archived = archive_match(
+                    match,
+                    keep_recent=options['keep_recent'],
+                    segment_size=options['segment_size']
+                )
+                if archived:
+                    chats += 1
+                    messages += archived
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {messages} messages from {chats} chats"))
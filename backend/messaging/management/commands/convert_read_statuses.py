@@ -0,0 +1,107 @@
+"""
+Convert a database from per-message read statuses to read watermarks.
+
+Run this once, right after ``migrate --run-syncdb`` has created the new
+tables and before the new code serves traffic. Databases built before the
+watermarks still have ``messaging_message.is_read`` as ``NOT NULL`` without
+a default, which the new send path no longer writes, so every send fails
+until this command has dropped the old columns. It always drops them; the
+old read-status table is only dropped with ``--drop-legacy``.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from messaging.checks import legacy_read_columns
+from messaging.models import Message, ReadWatermark
+
+LEGACY_TABLE = 'messaging_messagereadstatus'
+
+
+class Command(BaseCommand):
+    help = (
+        'One-off data migration: convert per-message read statuses into per-chat read '
+        'watermarks, then rebuild chat summaries and unread counters'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drop-legacy',
+            action='store_true',
+            help='Drop the read-status table afterwards (the old Message columns are always dropped)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        message_table = Message._meta.db_table
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        if message_table not in tables:
+            self.stdout.write('No message table found; run migrate --run-syncdb first')
+            return
+
+        converted = 0
+        with transaction.atomic():
+            if LEGACY_TABLE in tables:
+                converted = self.convert(options['batch_size'])
+                if options['drop_legacy']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"DROP TABLE {quote(LEGACY_TABLE)}")
+            else:
+                self.stdout.write('No read-status table found; nothing to convert')
+
+            # Messages are no longer written with these columns, and they
+            # are NOT NULL without a default, so they go even when the
+            # read-status table is kept
+            with connection.cursor() as cursor:
+                for column in legacy_read_columns():
+                    cursor.execute(f"ALTER TABLE {quote(message_table)} DROP COLUMN {quote(column)}")
+                    self.stdout.write(f"Dropped {message_table}.{column}")
+
+            if LEGACY_TABLE in tables:
+                call_command('rebuild_chat_summaries', stdout=self.stdout)
+                call_command('repair_unread_counters', stdout=self.stdout)
+
+        if LEGACY_TABLE in tables:
+            self.stdout.write(self.style.SUCCESS(f"Converted read state for {converted} (user, chat) pairs"))
+            if not options['drop_legacy']:
+                self.stdout.write('Read-status table kept; rerun with --drop-legacy to remove it')
+
+    def convert(self, batch_size):
+        """Write a watermark for every (user, chat) pair with read statuses. Returns the count."""
+        quote = connection.ops.quote_name
+        # A user has read a chat up to just before their first unread message,
+        # or to the end of it when nothing is unread
+        query = f"""
+            SELECT m.match_id, s.user_id,
+                   MIN(CASE WHEN s.is_read THEN NULL ELSE m.id END),
+                   MAX(m.id),
+                   MAX(s.read_at)
+            FROM {quote(LEGACY_TABLE)} s
+            JOIN {quote(Message._meta.db_table)} m ON m.id = s.message_id
+            GROUP BY m.match_id, s.user_id
+        """
+        converted = 0
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return converted
+                ReadWatermark.objects.bulk_create(
+                    [
+                        ReadWatermark(
+                            match_id=match_id,
+                            user_id=user_id,
+                            last_read_message_id=first_unread_id - 1 if first_unread_id else last_id,
+                            read_at=read_at
+                        )
+                        for match_id, user_id, first_unread_id, last_id, read_at in rows
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['user', 'match'],
+                    update_fields=['last_read_message_id', 'read_at']
+                )
+                converted += len(rows)
+
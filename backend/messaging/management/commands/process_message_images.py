@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from messaging.images import process_message_image
+from messaging.models import MessageImage
+
+
+class Command(BaseCommand):
+    help = 'Process message images that were left pending, e.g. by a restart while they were queued'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=5,
+            help='Only process uploads pending for at least this many minutes'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        message_ids = MessageImage.objects.filter(
+            status='pending',
+            message__created_at__lte=cutoff
+        ).values_list('message_id', flat=True)
+
+        statuses = {'ready': 0, 'failed': 0}
+        for message_id in message_ids.iterator():
+            variants = process_message_image(message_id)
+            statuses[variants.status] = statuses.get(variants.status, 0) + 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {statuses['ready']} images, rejected {statuses['failed']}"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from matching.models import Match
+from messaging.summaries import rebuild_chat_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every chat summary from messages and read statuses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--match', type=int, help='Only rebuild the summaries of this match id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        matches = Match.objects.order_by('id')
+        if options['match']:
+            matches = matches.filter(id=options['match'])
+
+        with transaction.atomic():
+            total = rebuild_chat_summaries(matches, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} chat summaries"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Re-index every message for full-text search (SQLite; PostgreSQL maintains its index itself)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_search_index(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} messages"))
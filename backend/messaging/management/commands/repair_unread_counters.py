@@ -0,0 +1,55 @@
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from matching.models import Match
+from messaging.counters import UNREAD_COUNT_KEY
+from messaging.models import UnreadCounter
+from messaging.summaries import count_unread
+
+
+class Command(BaseCommand):
+    help = 'Reconcile the unread badge counters with message read watermarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            actual = {}
+            matches = Match.objects.order_by('id').values_list('id', 'user1_id', 'user2_id').iterator(
+                chunk_size=batch_size
+            )
+            while True:
+                chunk = list(islice(matches, batch_size))
+                if not chunk:
+                    break
+                for (_, user_id), count in count_unread(chunk).items():
+                    actual[user_id] = actual.get(user_id, 0) + count
+            stored = dict(UnreadCounter.objects.values_list('user_id', 'count'))
+
+            checked = 0
+            fixed = []
+            for user_id in User.objects.values_list('id', flat=True).iterator(chunk_size=batch_size):
+                checked += 1
+                count = actual.get(user_id, 0)
+                if stored.get(user_id) != count:
+                    fixed.append(UnreadCounter(user_id=user_id, count=count))
+            UnreadCounter.objects.bulk_create(
+                fixed,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['count']
+            )
+            transaction.on_commit(lambda: cache.delete_many(
+                [UNREAD_COUNT_KEY.format(user_id=counter.user_id) for counter in fixed]
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, fixed {len(fixed)} counters"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from matching.models import Match
+from messaging.archive import restore_match
+from messaging.models import ArchivedMessageSegment
+
+
+class Command(BaseCommand):
+    help = 'Move archived messages back into the message table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--match', type=int, help='Only restore this match id')
+        parser.add_argument('--all', action='store_true', help='Restore every archived chat')
+        parser.add_argument('--batch-size', type=int, default=500, help='Matches loaded per query')
+
+    def handle(self, *args, **options):
+        if not options['match'] and not options['all']:
+            raise CommandError('Pass --match <id> or --all')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        match_ids = ArchivedMessageSegment.objects.values_list('match_id', flat=True).distinct()
+        if options['match']:
+            match_ids = match_ids.filter(match_id=options['match'])
+        match_ids = list(match_ids.order_by('match_id'))
+
+        chats = messages = 0
+        # Load matches in batches so the IN clause stays under the database's
+        # limit on query parameters
+        batch_size = options['batch_size']
+        for start in range(0, len(match_ids), batch_size):
+            for match in Match.objects.filter(id__in=match_ids[start:start + batch_size]).order_by('id'):
+                messages += restore_match(match)
+                chats += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Restored {messages} messages to {chats} chats"))
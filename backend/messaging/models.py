@@ -25,42 +25,136 @@ class Message(models.Model):
     content = models.TextField()  # For text messages or image URLs
     image = models.ImageField(upload_to='message_images/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
-    read_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination of a chat's history
+            models.Index(fields=['match', 'id'], name='message_match_id_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.university_email} in match {self.match.id}"
-    
-    def mark_as_read(self):
-        """Mark message as read"""
-        if not self.is_read:
-            from django.utils import timezone
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
 
 
-class MessageReadStatus(models.Model):
-    """Track read status of messages for each user"""
-    message = models.ForeignKey(
-        Message, 
-        on_delete=models.CASCADE, 
-        related_name='read_statuses'
-    )
+class ReadWatermark(models.Model):
+    """Per-user read position in a match; messages up to last_read_message_id are read"""
     user = models.ForeignKey(
-        User, 
-        on_delete=models.CASCADE, 
-        related_name='message_read_statuses'
+        User,
+        on_delete=models.CASCADE,
+        related_name='read_watermarks'
+    )
+    match = models.ForeignKey(
+        Match,
+        on_delete=models.CASCADE,
+        related_name='read_watermarks'
     )
-    is_read = models.BooleanField(default=False)
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
     read_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
-        unique_together = ('message', 'user')
+        unique_together = ('user', 'match')
+    
+    def __str__(self):
+        return f"{self.user.university_email} read match {self.match_id} up to message {self.last_read_message_id}"
+
+
+class ChatSummary(models.Model):
+    """Denormalized chat list entry for one user in one match"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chat_summaries'
+    )
+    match = models.ForeignKey(
+        Match,
+        on_delete=models.CASCADE,
+        related_name='chat_summaries'
+    )
+    other_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_activity_at = models.DateTimeField()
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('user', 'match')
+        indexes = [
+            models.Index(fields=['user', '-last_activity_at'], name='chat_summary_list_idx'),
+        ]
     
     def __str__(self):
-        return f"Read status for {self.user.university_email} on message {self.message.id}"
+        return f"Chat summary for {self.user.university_email} in match {self.match_id}"
 
+
+class UnreadCounter(models.Model):
+    """Running total of a user's unread messages, shown as the unread badge"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='unread_counter',
+        primary_key=True
+    )
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.count} unread for {self.user.university_email}"
+
+
+class MessageImage(models.Model):
+    """Processing state and resized variants of an image message"""
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    message = models.OneToOneField(
+        Message,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        primary_key=True
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    # Raw upload, deleted once the variants are written
+    upload = models.FileField(upload_to='message_uploads/', blank=True)
+    # Tiny blurred JPEG as a data URI, shown while the thumbnail loads
+    placeholder = models.TextField(blank=True)
+    thumbnail = models.ImageField(upload_to='message_images/thumbnails/', blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Image for message {self.message_id} ({self.status})"
+
+
+class ArchivedMessageSegment(models.Model):
+    """A block of a match's older messages moved out of the message table as zlib-compressed JSON"""
+    match = models.ForeignKey(
+        Match,
+        on_delete=models.CASCADE,
+        related_name='archived_segments'
+    )
+    first_message_id = models.PositiveBigIntegerField()
+    last_message_id = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['match', '-last_message_id'], name='archived_segment_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Messages {self.first_message_id}-{self.last_message_id} of match {self.match_id}"
@@ -0,0 +1,172 @@
+"""
+Full-text message search.
+
+On SQLite, messages are indexed in the contentless FTS5 table
+``messaging_message_fts``, kept up to date by triggers on
+``messaging_message`` so every insert, edit and delete updates the index in
+the same statement. Each row also indexes its match id as a token, so a
+search scoped to one chat intersects posting lists instead of filtering
+every hit in the table. On PostgreSQL the equivalent is a GIN index over the
+message's ``tsvector``, combined with the ``(match, id)`` index. Other
+backends fall back to an unindexed ``icontains``.
+
+The index and triggers are created after ``migrate`` once the message table
+exists, i.e. after ``makemigrations`` or ``migrate --run-syncdb`` has
+created it (see ``messaging.apps``); ``rebuild_message_search`` repopulates
+them.
+"""
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'messaging_message_fts'
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(content, match_key, content='', tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON messaging_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, match_key) VALUES (new.id, new.content, new.match_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON messaging_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, match_key)
+        VALUES ('delete', old.id, old.content, old.match_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF content, match_id ON messaging_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, match_key)
+        VALUES ('delete', old.id, old.content, old.match_id);
+        INSERT INTO {FTS_TABLE}(rowid, content, match_key) VALUES (new.id, new.content, new.match_id);
+    END""",
+]
+
+# Must match the expression Django generates for SearchVector('content', config='simple')
+POSTGRES_SCHEMA = [
+    """CREATE INDEX IF NOT EXISTS message_content_search_idx ON messaging_message
+        USING gin (to_tsvector('simple'::regconfig, COALESCE(content, '')))""",
+]
+
+
+def _has_message_table(connection):
+    from .models import Message
+    with connection.cursor() as cursor:
+        return Message._meta.db_table in connection.introspection.table_names(cursor)
+
+
+def install_search_index(using='default'):
+    """
+    Create the search index and its triggers if they are missing. Returns
+    True when the index was just created and still has to be populated.
+    Does nothing until the message table exists.
+    """
+    connection = connections[using]
+    if not _has_message_table(connection):
+        return False
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            created = cursor.fetchone() is None
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            return created
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+    return False
+
+
+def rebuild_search_index(using='default', batch_size=10000):
+    """Re-index every message (SQLite only; PostgreSQL indexes maintain themselves). Returns the count."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not _has_message_table(connection):
+        return 0
+    install_search_index(using)
+    total = 0
+    last_id = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        while True:
+            cursor.execute(
+                "SELECT MAX(id), COUNT(*) FROM ("
+                "SELECT id FROM messaging_message WHERE id > %s ORDER BY id LIMIT %s)",
+                [last_id, batch_size]
+            )
+            batch_last_id, count = cursor.fetchone()
+            if not count:
+                return total
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, content, match_key) "
+                "SELECT id, content, match_id FROM messaging_message WHERE id > %s AND id <= %s",
+                [last_id, batch_last_id]
+            )
+            last_id = batch_last_id
+            total += count
+
+
+def search_terms(text):
+    """Split a search string into words, dropping the query syntax characters"""
+    return re.findall(r'\w+', text or '')
+
+
+def _fts_query(terms, match_id=None):
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    query = 'content : (' + ' '.join(f'"{term}"' for term in terms) + ')'
+    if match_id is not None:
+        query = f'match_key : "{int(match_id)}" AND {query}'
+    return query
+
+
+def search_message_ids(text, match_id=None, limit=20, offset=0):
+    """
+    Get the ids of the messages matching every word of ``text``, best
+    match first, optionally only within one match.
+    """
+    from .models import Message
+    terms = search_terms(text)
+    if not terms:
+        return []
+
+    connection = connections[Message.objects.db]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+                [_fts_query(terms, match_id), limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    messages = Message.objects.all()
+    if match_id is not None:
+        messages = messages.filter(match_id=match_id)
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+        vector = SearchVector('content', config='simple')
+        query = SearchQuery(' '.join(terms), config='simple')
+        messages = messages.annotate(search=vector).filter(search=query).annotate(
+            rank=SearchRank(vector, query)
+        ).order_by('-rank', '-id')
+    else:
+        for term in terms:
+            messages = messages.filter(content__icontains=term)
+        messages = messages.order_by('-id')
+    return list(messages.values_list('id', flat=True)[offset:offset + limit])
+
+
+def filter_messages(queryset, text):
+    """Narrow a Message queryset to the messages matching every word of ``text``"""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts_query(terms)]
+        ))
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+        return queryset.filter(id__in=queryset.model.objects.annotate(
+            search=SearchVector('content', config='simple')
+        ).filter(search=SearchQuery(' '.join(terms), config='simple')).values('id'))
+    for term in terms:
+        queryset = queryset.filter(content__icontains=term)
+    return queryset
@@ -0,0 +1,32 @@
+"""
+Lean message ingest.
+
+Sending messages costs one bulk insert into ``messaging_message`` plus the
+two side-table writes of ``record_messages`` (the recipient's unread counter
+and both chat summaries), all in one transaction, whether one message is
+sent or a client flushes a queue of them after coming back online. Nothing
+is read back: the match and sender are already loaded by the view, and the
+recipient is known from the match's user ids.
+"""
+from django.db import transaction
+
+from . import events
+from .models import Message
+from .summaries import record_messages
+
+
+def send_messages(sender, match, messages):
+    """
+    Store messages from ``sender`` in ``match`` and push them to both users.
+    ``messages`` is a list of dicts of Message field values, oldest first.
+    Returns the created messages.
+    """
+    recipient_id = match.user2_id if sender.id == match.user1_id else match.user1_id
+    with transaction.atomic():
+        created = Message.objects.bulk_create([
+            Message(match=match, sender=sender, **fields) for fields in messages
+        ])
+        record_messages(created, recipient_id)
+        for message in created:
+            events.message_created(message, match)
+    return created
@@ -1,20 +1,51 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from .models import Message, MessageReadStatus
+from . import events
+from .images import queue_image
+from .models import Message, MessageImage
+from .sending import send_messages
+from .summaries import record_messages
 from accounts.serializers import UserSerializer
 
 
+class MessageImageSerializer(serializers.ModelSerializer):
+    """Serializer for the processing state and variants of an image message"""
+    class Meta:
+        model = MessageImage
+        fields = ('status', 'placeholder', 'thumbnail', 'width', 'height')
+
+
 class MessageSerializer(serializers.ModelSerializer):
-    """Serializer for messages"""
+    """Serializer for messages; read receipts come from the ``read_watermarks`` context"""
     sender = UserSerializer(read_only=True)
     sender_name = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+    read_at = serializers.SerializerMethodField()
+    image_variants = MessageImageSerializer(read_only=True)
     
     class Meta:
         model = Message
         fields = (
             'id', 'match', 'sender', 'sender_name', 'message_type', 
-            'content', 'image', 'created_at', 'is_read', 'read_at'
+            'content', 'image', 'image_variants', 'created_at', 'is_read', 'read_at'
         )
-        read_only_fields = ('id', 'created_at', 'is_read', 'read_at')
+        read_only_fields = ('id', 'created_at')
+    
+    def _recipient_watermark(self, obj):
+        match = obj.match
+        recipient_id = match.user2_id if obj.sender_id == match.user1_id else match.user1_id
+        watermarks = self.context.get('read_watermarks', {})
+        return watermarks.get((obj.match_id, recipient_id), (0, None))
+    
+    def get_is_read(self, obj):
+        """Whether the recipient has read this message"""
+        return obj.id <= self._recipient_watermark(obj)[0]
+    
+    def get_read_at(self, obj):
+        """When the recipient last read up to or past this message"""
+        last_read_message_id, read_at = self._recipient_watermark(obj)
+        return read_at if obj.id <= last_read_message_id else None
     
     def get_sender_name(self, obj):
         """Get sender's preferred name"""
@@ -36,7 +67,7 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         message_type = attrs['message_type']
         
         # Check if user is part of the match
-        if self.context['request'].user not in [match.user1, match.user2]:
+        if self.context['request'].user.id not in (match.user1_id, match.user2_id):
             raise serializers.ValidationError("You are not part of this match")
         
         # Check if match is fully connected for image messages
@@ -45,29 +76,48 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         
         return attrs
     
+    def validate_image(self, value):
+        """Reject oversized uploads before they are stored"""
+        if value and value.size > settings.MESSAGE_IMAGE_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"Images can be at most {settings.MESSAGE_IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} MB"
+            )
+        return value
+    
     def create(self, validated_data):
-        """Create message"""
-        validated_data['sender'] = self.context['request'].user
-        message = Message.objects.create(**validated_data)
-        
-        # Create read status for both users
+        """
+        Create message, update both users' chat summaries and push it to
+        them. Images are stored raw and processed in the background.
+        """
+        sender = validated_data['sender'] = self.context['request'].user
         match = validated_data['match']
-        for user in [match.user1, match.user2]:
-            MessageReadStatus.objects.get_or_create(
-                message=message,
-                user=user,
-                defaults={'is_read': user == validated_data['sender']}
-            )
+        upload = validated_data.pop('image', None)
+        with transaction.atomic():
+            message = Message.objects.create(**validated_data)
+            if upload:
+                queue_image(message, upload)
+            record_messages([message], match.user2_id if sender.id == match.user1_id else match.user1_id)
+            events.message_created(message, match)
         
         return message
 
 
-class MessageReadStatusSerializer(serializers.ModelSerializer):
-    """Serializer for message read status"""
-    class Meta:
-        model = MessageReadStatus
-        fields = ('user', 'is_read', 'read_at')
-        read_only_fields = ('read_at',)
+class TextMessageSerializer(serializers.Serializer):
+    """Serializer for one text message of a batch"""
+    content = serializers.CharField()
+
+
+class MessageBatchSerializer(serializers.Serializer):
+    """Serializer for a batch of queued text messages to one match"""
+    messages = TextMessageSerializer(many=True, allow_empty=False, max_length=settings.MESSAGE_BATCH_MAX_SIZE)
+    
+    def create(self, validated_data):
+        """Store the whole batch in one transaction, in the order it was queued"""
+        return send_messages(
+            self.context['request'].user,
+            self.context['match'],
+            [{'message_type': 'text', 'content': item['content']} for item in validated_data['messages']]
+        )
 
 
 class ChatSummarySerializer(serializers.Serializer):
@@ -0,0 +1,17 @@
+from django.dispatch import receiver
+
+from matching.signals import matches_created
+from . import events
+from .summaries import create_chat_summaries
+
+
+@receiver(matches_created)
+def add_chat_summaries(sender, matches, **kwargs):
+    """Give both users of every new match an entry in their chat list"""
+    create_chat_summaries(matches)
+
+
+@receiver(matches_created)
+def push_new_matches(sender, matches, **kwargs):
+    """Tell connected users about their new matches"""
+    events.matches_created(matches)
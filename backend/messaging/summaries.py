@@ -0,0 +1,155 @@
+"""
+Denormalized chat list.
+
+``ChatSummary`` keeps one row per (user, match) with the last message, the
+time of the last activity and the user's unread count, so the chat list is a
+single indexed read ordered by activity. Rows are created together with
+their match (``matching.signals.matches_created``) and updated in the same
+transaction as message sends and read marks, together with the unread badge
+counters (see ``messaging.counters``). ``rebuild_chat_summaries``
+recomputes rows from messages and read watermarks for backfills and repairs.
+"""
+from itertools import islice
+
+from django.db.models import Case, F, Max, OuterRef, PositiveIntegerField, Subquery, When
+from django.utils import timezone
+
+from . import events
+from .counters import add_unread, decrement_unread, lock_counter
+from .models import ChatSummary, Message, ReadWatermark
+
+
+def create_chat_summaries(matches):
+    """Create empty summaries for both users of each new match"""
+    ChatSummary.objects.bulk_create(
+        [
+            ChatSummary(
+                user_id=user_id,
+                match_id=match.id,
+                other_user_id=other_user_id,
+                last_activity_at=match.created_at
+            )
+            for match in matches
+            for user_id, other_user_id in (
+                (match.user1_id, match.user2_id),
+                (match.user2_id, match.user1_id)
+            )
+        ],
+        ignore_conflicts=True
+    )
+
+
+def record_messages(messages, recipient_id):
+    """
+    Move new messages of one match, oldest first, to the top of both users'
+    chat lists and badge them. Costs two queries however many messages.
+    """
+    message = messages[-1]
+    add_unread(recipient_id, len(messages))
+    updated = ChatSummary.objects.filter(match_id=message.match_id).update(
+        last_message=message,
+        last_activity_at=message.created_at,
+        unread_count=Case(
+            When(user_id=recipient_id, then=F('unread_count') + len(messages)),
+            default=F('unread_count'),
+            output_field=PositiveIntegerField()
+        )
+    )
+    if updated < 2:
+        # The match predates the summary table; recompute its rows instead
+        from matching.models import Match
+        rebuild_chat_summaries(Match.objects.filter(id=message.match_id))
+
+
+def mark_chat_read(user, match):
+    """
+    Move a user's read watermark to the latest message in a match, clear
+    their unread count for it, take it off their badge and send the read
+    receipt to both users
+    """
+    lock_counter(user.id)
+    last_message_id = Message.objects.filter(match=match).aggregate(last=Max('id'))['last']
+    if last_message_id:
+        read_at = timezone.now()
+        ReadWatermark.objects.bulk_create(
+            [ReadWatermark(user=user, match=match, last_read_message_id=last_message_id, read_at=read_at)],
+            update_conflicts=True,
+            unique_fields=['user', 'match'],
+            update_fields=['last_read_message_id', 'read_at']
+        )
+        events.chat_read(user, match, last_message_id, read_at)
+    unread = ChatSummary.objects.filter(user=user, match=match).values_list(
+        'unread_count', flat=True
+    ).first()
+    if unread:
+        ChatSummary.objects.filter(user=user, match=match).update(unread_count=0)
+        decrement_unread(user.id, unread)
+
+
+def get_read_watermarks(match_ids):
+    """Map (match id, user id) to (last read message id, read at) for the given matches"""
+    return {
+        (match_id, user_id): (last_read_message_id, read_at)
+        for match_id, user_id, last_read_message_id, read_at in ReadWatermark.objects.filter(
+            match_id__in=match_ids
+        ).values_list('match_id', 'user_id', 'last_read_message_id', 'read_at')
+    }
+
+
+def count_unread(matches):
+    """
+    Count each user's unread messages in the given ``(match id, user1 id,
+    user2 id)`` rows by comparing message ids with their read watermarks.
+    Returns a dict keyed by (match id, user id).
+    """
+    members = {match_id: (user1_id, user2_id) for match_id, user1_id, user2_id in matches}
+    watermarks = get_read_watermarks(members)
+    unread = {}
+    messages = Message.objects.filter(match_id__in=members).values_list('match_id', 'sender_id', 'id')
+    for match_id, sender_id, message_id in messages.iterator(chunk_size=5000):
+        user1_id, user2_id = members[match_id]
+        reader_id = user2_id if sender_id == user1_id else user1_id
+        if message_id > watermarks.get((match_id, reader_id), (0, None))[0]:
+            unread[(match_id, reader_id)] = unread.get((match_id, reader_id), 0) + 1
+    return unread
+
+
+def rebuild_chat_summaries(matches, batch_size=1000):
+    """
+    Recompute the summaries of the given Match queryset from messages and
+    read watermarks. Returns the number of rows written.
+    """
+    last_message = Message.objects.filter(match=OuterRef('pk')).order_by('-created_at', '-id')
+    rows = matches.annotate(
+        last_message_id=Subquery(last_message.values('id')[:1]),
+        last_message_at=Subquery(last_message.values('created_at')[:1])
+    ).values_list(
+        'id', 'user1_id', 'user2_id', 'created_at', 'last_message_id', 'last_message_at'
+    ).iterator(chunk_size=batch_size)
+
+    total = 0
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return total
+
+        unread = count_unread([row[:3] for row in chunk])
+        summaries = [
+            ChatSummary(
+                user_id=user_id,
+                match_id=match_id,
+                other_user_id=other_user_id,
+                last_message_id=last_message_id,
+                last_activity_at=last_message_at or created_at,
+                unread_count=unread.get((match_id, user_id), 0)
+            )
+            for match_id, user1_id, user2_id, created_at, last_message_id, last_message_at in chunk
+            for user_id, other_user_id in ((user1_id, user2_id), (user2_id, user1_id))
+        ]
+        ChatSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['user', 'match'],
+            update_fields=['other_user', 'last_message', 'last_activity_at', 'unread_count']
+        )
+        total += len(summaries)
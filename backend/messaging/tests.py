@@ -0,0 +1,275 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import University, User
+from matching.services import record_swipes
+from profiles.models import ProfilePicture, UserProfile
+from .archive import archive_match, restore_match
+from .models import ArchivedMessageSegment, Message, MessageImage
+from .sending import send_messages
+
+
+class MessagingTestCase(TestCase):
+    """Alice and Bob are matched and Alice has waved at Carol; ``self.client`` is Alice's"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(3)
+        ])
+        self.alice, self.bob, self.carol = User.objects.order_by('id')
+        for user in (self.alice, self.bob, self.carol):
+            UserProfile.objects.create(
+                user=user,
+                full_name=user.username,
+                preferred_name=user.username,
+                year='junior',
+                hobbies='hiking, chess',
+                interests='coding'
+            )
+        record_swipes(self.alice, [(self.bob.id, 'wave'), (self.carol.id, 'wave')])
+        self.match, = record_swipes(self.bob, [(self.alice.id, 'wave')])
+        self.client = self.client_for(self.alice)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class SendQueryCountTests(MessagingTestCase):
+    """Ingest stays within its write budget, and the endpoints add a fixed cost on top, whatever the batch size"""
+    # Message insert, unread counter upsert and chat summary update
+    MAX_INGEST_QUERIES = 3
+    # Match lookup, the transaction's savepoint and its release, and the
+    # sender for the response
+    VIEW_QUERIES = 4
+    SEND_QUERIES = MAX_INGEST_QUERIES + VIEW_QUERIES
+
+    def test_ingest(self):
+        for size in (1, 10):
+            with self.subTest(size=size), CaptureQueriesContext(connection) as queries:
+                send_messages(self.alice, self.match, [
+                    {'message_type': 'text', 'content': f'message {i}'} for i in range(size)
+                ])
+            statements = [
+                query['sql'] for query in queries
+                if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+            ]
+            self.assertLessEqual(len(statements), self.MAX_INGEST_QUERIES, statements)
+
+    def test_send_text(self):
+        with self.assertNumQueries(self.SEND_QUERIES):
+            response = self.client.post(
+                f'/api/messaging/chats/{self.match.id}/send-text/', {'content': 'hi'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_send_batch(self):
+        for size in (1, 10):
+            with self.subTest(size=size), self.assertNumQueries(self.SEND_QUERIES):
+                response = self.client.post(
+                    f'/api/messaging/chats/{self.match.id}/send-batch/',
+                    {'messages': [{'content': f'message {i}'} for i in range(size)]},
+                    format='json'
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()['results']), size)
+        self.assertEqual(Message.objects.count(), 11)
+
+    def test_send_to_foreign_match(self):
+        # Carol's own match passes validation, but the URL names Alice and Bob's
+        own_match, = record_swipes(self.carol, [(self.alice.id, 'wave')])
+        response = self.client_for(self.carol).post(
+            f'/api/messaging/chats/{self.match.id}/messages/',
+            {'match': own_match.id, 'message_type': 'text', 'content': 'hi'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Message.objects.exists())
+
+
+class ArchiveRoundTripTests(MessagingTestCase):
+    """Archiving and restoring a chat must not change a single row or page"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(30):
+            send_messages(self.alice if i % 2 else self.bob, self.match, [
+                {'message_type': 'text', 'content': f'message {i}.{j} ünïcode "quoted"\n'}
+                for j in range(10)
+            ])
+        messages = list(Message.objects.filter(match=self.match).order_by('id'))
+        image = messages[5]
+        image.message_type = 'image'
+        image.image = 'message_images/photo.jpg'
+        image.save()
+        MessageImage.objects.create(
+            message=image,
+            status='ready',
+            placeholder='data:image/jpeg;base64,AAAA',
+            thumbnail='message_images/thumbnails/photo.jpg',
+            width=640,
+            height=480,
+            processed_at=datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        )
+        Message.objects.filter(id=messages[6].id).update(
+            created_at=datetime(2025, 5, 5, 5, 5, 5, 5, tzinfo=timezone.utc)
+        )
+        for user in (self.alice, self.bob):
+            self.client_for(user).post(f'/api/messaging/chats/{self.match.id}/mark-read/')
+        send_messages(self.alice, self.match, [{'message_type': 'text', 'content': 'still unread'}])
+
+    def raw_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT * FROM messaging_message ORDER BY id")
+            messages = cursor.fetchall()
+            cursor.execute("SELECT * FROM messaging_messageimage ORDER BY message_id")
+            images = cursor.fetchall()
+        return messages, images
+
+    def all_pages(self, user, page_size):
+        """Every message of the chat, newest first, read page by page through the API"""
+        results = []
+        params = {'page_size': page_size}
+        while True:
+            response = self.client_for(user).get(f'/api/messaging/chats/{self.match.id}/messages/', params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            results += page['results']
+            if page['before'] is None:
+                return results
+            params['before'] = page['before']
+
+    def test_round_trip(self):
+        rows = self.raw_rows()
+        pages = {user: self.all_pages(user, 37) for user in (self.alice, self.bob)}
+        self.assertEqual(len(pages[self.alice]), 301)
+
+        archived = archive_match(self.match, keep_recent=50, segment_size=100)
+        # Everything but the newest 50 messages; the unread one is among them
+        self.assertEqual(archived, 251)
+        self.assertEqual(Message.objects.count(), 50)
+        self.assertEqual(ArchivedMessageSegment.objects.count(), 3)
+        for user in (self.alice, self.bob):
+            self.assertEqual(self.all_pages(user, 37), pages[user])
+            self.assertEqual(self.all_pages(user, 50), pages[user])
+
+        self.assertEqual(restore_match(self.match), 251)
+        self.assertFalse(ArchivedMessageSegment.objects.exists())
+        self.assertEqual(self.raw_rows(), rows)
+        for user in (self.alice, self.bob):
+            self.assertEqual(self.all_pages(user, 37), pages[user])
+
+    def test_keeps_unread_messages(self):
+        # Both users have read up to message 300; Bob has not read Alice's
+        # last message and Alice has not read Bob's next five
+        send_messages(self.bob, self.match, [
+            {'message_type': 'text', 'content': f'unread {i}'} for i in range(5)
+        ])
+        self.assertEqual(archive_match(self.match, keep_recent=1), 300)
+        self.assertEqual(
+            list(Message.objects.filter(match=self.match).order_by('id').values_list('id', flat=True)),
+            list(range(301, 307))
+        )
+
+    def test_commands_work_in_batches(self):
+        call_command(
+            'archive_cold_chats', inactive_days=-1, keep_recent=50, batch_size=1, stdout=StringIO()
+        )
+        self.assertEqual(Message.objects.count(), 50)
+        call_command('restore_archived_messages', all=True, batch_size=1, stdout=StringIO())
+        self.assertEqual(Message.objects.count(), 301)
+        self.assertFalse(ArchivedMessageSegment.objects.exists())
+
+
+class ConditionalGetTests(MessagingTestCase):
+    """ETags come from the database, so they work with the default per-process cache"""
+    CHATS = '/api/messaging/chats/'
+    MATCHES = '/api/matching/matches/'
+
+    def assertChanges(self, url, change):
+        """Assert that ``url`` answers 304 until ``change`` runs, then 200 with a new ETag"""
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_message_sent(self):
+        messages = f'/api/messaging/chats/{self.match.id}/messages/'
+        send = lambda: send_messages(self.bob, self.match, [{'message_type': 'text', 'content': 'hi'}])
+        for url in (self.CHATS, self.MATCHES, messages):
+            with self.subTest(url=url):
+                self.assertChanges(url, send)
+
+    def test_read_receipt(self):
+        send_messages(self.alice, self.match, [{'message_type': 'text', 'content': 'hi'}])
+        read = lambda: self.client_for(self.bob).post(f'/api/messaging/chats/{self.match.id}/mark-read/')
+        self.assertChanges(f'/api/messaging/chats/{self.match.id}/messages/', read)
+
+    def test_matched_profile_edited(self):
+        # Bob is at another university, so no pool Alice sees has his profile
+        other = University.objects.create(name='Other University', domain='other.edu')
+        User.objects.filter(pk=self.bob.pk).update(university=other)
+
+        def edit():
+            self.bob.profile.preferred_name = 'Robert'
+            self.bob.profile.save()
+
+        for url in (self.CHATS, self.MATCHES, f'{self.MATCHES}?compact=1'):
+            with self.subTest(url=url):
+                self.assertChanges(url, edit)
+
+    def test_matched_picture_added(self):
+        add = lambda: ProfilePicture.objects.create(profile=self.bob.profile, image='profile_pictures/bob.jpg')
+        self.assertChanges(self.MATCHES, add)
+
+    def test_new_match(self):
+        self.assertChanges(self.MATCHES, lambda: record_swipes(self.carol, [(self.alice.id, 'wave')]))
+
+
+class PollTests(TransactionTestCase):
+    """The long-poll endpoint validates its parameters"""
+    # A TransactionTestCase, since database_sync_to_async closes the
+    # connection that a TestCase's transaction lives on
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=university)
+            for i in range(2)
+        ])
+        self.alice, self.bob = User.objects.order_by('id')
+        record_swipes(self.alice, [(self.bob.id, 'wave')])
+        self.match, = record_swipes(self.bob, [(self.alice.id, 'wave')])
+
+    def poll(self, **params):
+        return self.client.get(
+            '/api/messaging/poll/', params,
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}'
+        )
+
+    def test_rejects_non_finite_timeout(self):
+        for timeout in ('nan', 'inf', '-inf', '-1'):
+            with self.subTest(timeout=timeout):
+                self.assertEqual(self.poll(timeout=timeout).status_code, 400)
+        for after in ('nan', 'inf', '-1'):
+            with self.subTest(after=after):
+                self.assertEqual(self.poll(after=after).status_code, 400)
+
+    def test_returns_new_messages(self):
+        send_messages(self.bob, self.match, [{'message_type': 'text', 'content': 'hi'}])
+        response = self.poll(timeout=0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message['content'] for message in response.json()['messages']], ['hi'])
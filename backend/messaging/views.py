@@ -1,17 +1,36 @@
+import asyncio
+import math
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Max
-from .models import Message, MessageReadStatus
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Max, OuterRef, Subquery, prefetch_related_objects
+from django.http import JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from matching.versions import compute_etag, is_not_modified, match_version, user_version
+from .models import Message, ReadWatermark, ChatSummary
 # from matching.models import Match  # Will import later to avoid circular import
 from .serializers import (
     MessageSerializer,
     MessageCreateSerializer,
-    MessageReadStatusSerializer,
+    MessageBatchSerializer,
+    TextMessageSerializer,
     ChatSummarySerializer
 )
+from .archive import fill_from_archive
+from .counters import cached_unread_count
+from .events import message_payload, user_group
+from .history import get_message_page
+from .search import search_message_ids, search_terms
+from .sending import send_messages
+from .summaries import get_read_watermarks, mark_chat_read
 
 
 class MessageListCreateView(generics.ListCreateAPIView):
@@ -32,68 +51,123 @@ class MessageListCreateView(generics.ListCreateAPIView):
             id=match_id
         )
         # Check if user is part of the match
-        if self.request.user not in [match.user1, match.user2]:
+        if self.request.user.id not in [match.user1_id, match.user2_id]:
             from django.http import Http404
             raise Http404("Match not found")
-        return Message.objects.filter(match=match)
+        self.match = match
+        return Message.objects.filter(match=match).select_related(
+            'match', 'sender__university', 'sender__profile', 'image_variants'
+        )
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Get one keyset-paginated page of messages (``?before=<id>`` /
+        ``?after=<id>``), or 304 if the client's ETag is still current
+        """
+        try:
+            page_size = int(request.query_params.get('page_size', settings.MESSAGE_PAGE_SIZE))
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= settings.MESSAGE_MAX_PAGE_SIZE:
+            return Response({
+                'error': f'page_size must be between 1 and {settings.MESSAGE_MAX_PAGE_SIZE}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            before, after = (
+                int(request.query_params[name]) if name in request.query_params else None
+                for name in ('before', 'after')
+            )
+        except ValueError:
+            return Response({
+                'error': 'before and after must be message ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_queryset()
+        etag = compute_etag(request, *match_version(self.match.id))
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        messages, cursors = get_message_page(
+            queryset,
+            before=before,
+            after=after,
+            page_size=page_size
+        )
+        if after is None and cursors['before'] is None:
+            # Scrolled past the hot messages; carry on into the archive
+            messages, cursors = fill_from_archive(self.match, messages, cursors, before, page_size)
+        serializer = self.get_serializer(messages, many=True)
+        return Response({**cursors, 'results': serializer.data}, headers={'ETag': etag})
+    
+    def get_serializer_context(self):
+        """Add both users' read watermarks for the read receipts"""
+        context = super().get_serializer_context()
+        context['read_watermarks'] = get_read_watermarks([self.kwargs['match_id']])
+        return context
     
     def perform_create(self, serializer):
-        """Create message and update read status"""
+        """Create the message in the URL's match, which the user must be part of"""
         from matching.models import Match
-        match_id = self.kwargs['match_id']
         match = get_object_or_404(
-            Match,
-            id=match_id
+            Match.objects.filter(Q(user1_id=self.request.user.id) | Q(user2_id=self.request.user.id)),
+            id=self.kwargs['match_id']
         )
-        # Check if user is part of the match
-        if self.request.user not in [match.user1, match.user2]:
-            from django.http import Http404
-            raise Http404("Match not found")
         serializer.save(match=match)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_chat_list(request):
-    """Get list of all chats (matches with last message)"""
-    from matching.models import Match
-    user = request.user
+    """Get list of all chats (matches with last message), most recent activity first"""
+    etag = compute_etag(request, *user_version(request.user.id))
+    if is_not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
     
-    # Get all matches for the user
-    from django.db import models
-    matches = Match.objects.filter(
-        models.Q(user1=user) | models.Q(user2=user)
-    ).order_by('-created_at')
+    watermark = ReadWatermark.objects.filter(match=OuterRef('match'), user=OuterRef('other_user'))
+    summaries = ChatSummary.objects.filter(user=request.user).select_related(
+        'match',
+        'other_user__university',
+        'other_user__profile',
+        'last_message__match',
+        'last_message__sender__university',
+        'last_message__sender__profile',
+        'last_message__image_variants'
+    ).annotate(
+        other_last_read_id=Subquery(watermark.values('last_read_message_id')[:1]),
+        other_read_at=Subquery(watermark.values('read_at')[:1])
+    ).order_by('-last_activity_at', '-match_id')
     
     chat_summaries = []
+    read_watermarks = {}
     
-    for match in matches:
-        # Get other user
-        other_user = match.get_other_user(user)
-        
-        # Get last message
-        last_message = Message.objects.filter(match=match).last()
-        
-        # Count unread messages
-        unread_count = MessageReadStatus.objects.filter(
-            message__match=match,
-            user=user,
-            is_read=False
-        ).count()
-        
+    for summary in summaries:
+        # The last message counts as read by the viewer when they have no
+        # unread messages left; the other side comes from their watermark
+        if summary.last_message_id:
+            read_watermarks[(summary.match_id, summary.other_user_id)] = (
+                summary.other_last_read_id or 0, summary.other_read_at
+            )
+            if not summary.unread_count:
+                read_watermarks[(summary.match_id, request.user.id)] = (summary.last_message_id, None)
+        other_user = summary.other_user
         chat_summary = {
-            'match_id': match.id,
+            'match_id': summary.match_id,
             'other_user': other_user,
             'other_user_name': other_user.profile.preferred_name if hasattr(other_user, 'profile') else other_user.university_email,
-            'last_message': last_message,
-            'unread_count': unread_count,
-            'is_fully_connected': match.is_fully_connected
+            'last_message': summary.last_message,
+            'unread_count': summary.unread_count,
+            'is_fully_connected': summary.match.is_fully_connected
         }
         
         chat_summaries.append(chat_summary)
     
-    serializer = ChatSummarySerializer(chat_summaries, many=True, context={'request': request})
-    return Response(serializer.data)
+    serializer = ChatSummarySerializer(
+        chat_summaries,
+        many=True,
+        context={'request': request, 'read_watermarks': read_watermarks}
+    )
+    return Response(serializer.data, headers={'ETag': etag})
 
 
 @api_view(['POST'])
@@ -113,11 +187,8 @@ def mark_messages_read(request, match_id):
         }, status=status.HTTP_404_NOT_FOUND)
     
     # Mark all messages in this match as read for current user
-    MessageReadStatus.objects.filter(
-        message__match=match,
-        user=request.user,
-        is_read=False
-    ).update(is_read=True)
+    with transaction.atomic():
+        mark_chat_read(request.user, match)
     
     return Response({
         'message': 'Messages marked as read'
@@ -128,13 +199,8 @@ def mark_messages_read(request, match_id):
 @permission_classes([IsAuthenticated])
 def get_unread_count(request):
     """Get total unread message count for the user"""
-    unread_count = MessageReadStatus.objects.filter(
-        user=request.user,
-        is_read=False
-    ).count()
-    
     return Response({
-        'unread_count': unread_count
+        'unread_count': cached_unread_count(request.user.id)
     }, status=status.HTTP_200_OK)
 
 
@@ -154,25 +220,45 @@ def send_text_message(request, match_id):
             'error': 'Match not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    serializer = MessageCreateSerializer(
-        data={
-            'match': match.id,
-            'message_type': 'text',
-            'content': request.data.get('content')
-        },
-        context={'request': request}
-    )
+    serializer = TextMessageSerializer(data=request.data)
     
     if serializer.is_valid():
-        message = serializer.save()
+        message, = send_messages(request.user, match, [{
+            'message_type': 'text',
+            'content': serializer.validated_data['content']
+        }])
         return Response(
-            MessageSerializer(message).data,
+            render_sent_messages(request, [message])[0],
             status=status.HTTP_201_CREATED
         )
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def send_message_batch(request, match_id):
+    """Send text messages queued while offline, in order, in one request"""
+    from matching.models import Match
+    try:
+        match = Match.objects.get(
+            Q(user1=request.user) | Q(user2=request.user),
+            id=match_id
+        )
+    except Match.DoesNotExist:
+        return Response({
+            'error': 'Match not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = MessageBatchSerializer(data=request.data, context={'request': request, 'match': match})
+    if serializer.is_valid():
+        messages = serializer.save()
+        return Response({
+            'results': render_sent_messages(request, messages)
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_image_message(request, match_id):
@@ -212,3 +298,139 @@ def send_image_message(request, match_id):
         )
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_messages(request, match_id):
+    """Full-text search within one chat, best match first (``?q=<words>&page=<n>``)"""
+    from matching.models import Match
+    try:
+        match = Match.objects.get(
+            Q(user1=request.user) | Q(user2=request.user),
+            id=match_id
+        )
+    except Match.DoesNotExist:
+        return Response({
+            'error': 'Match not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    query = request.query_params.get('q', '')
+    if not search_terms(query):
+        return Response({
+            'error': 'q must contain at least one word'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', settings.MESSAGE_PAGE_SIZE))
+    except ValueError:
+        page = page_size = 0
+    if page < 1 or not 1 <= page_size <= settings.MESSAGE_MAX_PAGE_SIZE:
+        return Response({
+            'error': f'page must be positive and page_size between 1 and {settings.MESSAGE_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    ids = search_message_ids(query, match_id=match.id, limit=page_size + 1, offset=(page - 1) * page_size)
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    messages = Message.objects.filter(id__in=ids).select_related(
+        'match', 'sender__university', 'sender__profile', 'image_variants'
+    ).in_bulk()
+    serializer = MessageSerializer(
+        [messages[message_id] for message_id in ids if message_id in messages],
+        many=True,
+        context={'request': request, 'read_watermarks': get_read_watermarks([match.id])}
+    )
+    return Response({
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'results': serializer.data
+    })
+
+
+def render_sent_messages(request, messages):
+    """Serialize messages the request user just sent, with one sender lookup for all of them"""
+    from accounts.models import User
+    sender = User.objects.select_related('university', 'profile').get(id=request.user.id)
+    for message in messages:
+        message.sender = sender
+    if any(message.message_type == 'image' for message in messages):
+        prefetch_related_objects(messages, 'image_variants')
+    else:
+        # Text messages have no image row; cache that rather than look it up
+        image_variants = Message._meta.get_field('image_variants')
+        for message in messages:
+            image_variants.set_cached_value(message, None)
+    return MessageSerializer(messages, many=True).data
+
+
+def get_updates(user, after):
+    """Messages newer than ``after`` in any of the user's chats, with their unread badge count"""
+    messages = Message.objects.filter(
+        match_id__in=ChatSummary.objects.filter(user=user).values('match_id'),
+        id__gt=after
+    ).order_by('id')[:settings.MESSAGE_MAX_PAGE_SIZE]
+    messages = [dict(message_payload(message), match_id=message.match_id) for message in messages]
+    return {
+        'messages': messages,
+        'unread_count': cached_unread_count(user.id),
+        'after': messages[-1]['id'] if messages else after
+    }
+
+
+async def poll_updates(request):
+    """
+    Long-poll for new messages, for clients that cannot keep a WebSocket open.
+    
+    Returns right away if any of the user's chats has a message newer than
+    ``after``; otherwise waits on the user's channel-layer group (the same
+    events the WebSocket pushes) until something happens or ``timeout``
+    seconds pass. Pass the returned ``after`` to the next poll. The view is
+    async so an idle wait holds no worker thread when served over ASGI.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    try:
+        authenticated = await database_sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return JsonResponse({'error': 'Invalid or expired token'}, status=status.HTTP_401_UNAUTHORIZED)
+    if authenticated is None:
+        return JsonResponse({
+            'error': 'Authentication credentials were not provided.'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    user = authenticated[0]
+    
+    try:
+        after = int(request.GET.get('after', 0))
+        timeout = float(request.GET.get('timeout', settings.MESSAGE_POLL_TIMEOUT))
+        # nan and inf would get past both checks and the clamp below
+        if after < 0 or not math.isfinite(timeout) or timeout < 0:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'error': 'after and timeout must be non-negative numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    timeout = min(timeout, settings.MESSAGE_POLL_MAX_TIMEOUT)
+    
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return JsonResponse(await database_sync_to_async(get_updates)(user, after))
+    
+    # Subscribe before looking, so a message sent in between still wakes us
+    group = user_group(user.id)
+    channel = await channel_layer.new_channel()
+    await channel_layer.group_add(group, channel)
+    try:
+        updates = await database_sync_to_async(get_updates)(user, after)
+        if not updates['messages'] and timeout:
+            try:
+                await asyncio.wait_for(channel_layer.receive(channel), timeout)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                updates = await database_sync_to_async(get_updates)(user, after)
+    finally:
+        await channel_layer.group_discard(group, channel)
+    
+    return JsonResponse(updates)
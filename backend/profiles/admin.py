@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, ProfilePicture
+from .models import UserProfile, ProfilePicture, InterestTag
 
 
 @admin.register(UserProfile)
@@ -19,3 +19,10 @@ class ProfilePictureAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
 
+
+
+@admin.register(InterestTag)
+class InterestTagAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+    ordering = ('name',)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from profiles.models import UserProfile, ProfileTag
+from profiles.tags import get_tag_ids, profile_tag_pairs
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the interest/hobby tag index from profile text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profiles = UserProfile.objects.order_by('pk').values_list('pk', 'hobbies', 'interests')
+        indexed = entries = 0
+
+        with transaction.atomic():
+            ProfileTag.objects.all().delete()
+            batch = []
+            for row in profiles.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    entries += self.index_batch(batch)
+                    indexed += len(batch)
+                    batch = []
+            entries += self.index_batch(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} profiles ({entries} tag entries)"
+        ))
+
+    def index_batch(self, rows):
+        pairs = {
+            profile_id: profile_tag_pairs(hobbies, interests)
+            for profile_id, hobbies, interests in rows
+        }
+        tag_ids = get_tag_ids(name for tags in pairs.values() for name, _ in tags)
+        entries = [
+            ProfileTag(tag_id=tag_ids[name], profile_id=profile_id, source=source)
+            for profile_id, tags in pairs.items()
+            for name, source in tags
+        ]
+        ProfileTag.objects.bulk_create(entries)
+        return len(entries)
@@ -77,3 +77,38 @@ class ProfilePicture(models.Model):
             ).exclude(id=self.id).update(is_primary=False)
         super().save(*args, **kwargs)
 
+
+
+class InterestTag(models.Model):
+    """Normalized hobby/interest keyword shared across profiles"""
+    name = models.CharField(max_length=50, unique=True)
+    
+    def __str__(self):
+        return self.name
+
+
+class ProfileTag(models.Model):
+    """Inverted index entry linking a tag to a profile that mentions it"""
+    SOURCE_CHOICES = [
+        ('hobby', 'Hobby'),
+        ('interest', 'Interest'),
+    ]
+    
+    tag = models.ForeignKey(
+        InterestTag,
+        on_delete=models.CASCADE,
+        related_name='profile_tags'
+    )
+    profile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='tags'
+    )
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    
+    class Meta:
+        # Leading with tag makes the unique index double as the posting list
+        unique_together = ('tag', 'profile', 'source')
+    
+    def __str__(self):
+        return f"{self.tag.name} ({self.source}) for {self.profile.preferred_name}"
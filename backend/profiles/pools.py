@@ -0,0 +1,111 @@
+"""
+Candidate pool cache shared by the swipe feed endpoints.
+
+Swipe candidates are scoped by (university, year). Each pool's profile ids
+and ranking feature matrix are cached under a per-university version stamp,
+so the matrix is built once per pool rather than on every deck build, and every
+profile's swipe card is cached under its own key, so concurrent feed
+requests share one copy instead of re-querying the same pool. Saving a
+profile drops its card; creating or deleting one, changing its year,
+hobbies or interests, or moving or (de)activating its user also bumps the
+version (see ``profiles.signals``); stale entries are simply never read again. Both only
+reach other workers when the cache is shared between them (see
+``matching.checks``).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+from .serializers import SwipeProfileSerializer
+from .tags import profile_tokens
+
+POOL_KEY = 'candidate_pool:{university_id}:{year}:{version}'
+POOL_VERSION_KEY = 'candidate_pool_version:{university_id}'
+CARD_KEY = 'swipe_card:{profile_id}'
+
+
+def pool_version(university_id):
+    """Get a university's pool version stamp, which changes whenever one of its profiles does"""
+    key = POOL_VERSION_KEY.format(university_id=university_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_pool(university_id):
+    """Make every cached pool of a university unreachable"""
+    cache.set(POOL_VERSION_KEY.format(university_id=university_id), time.time_ns(), timeout=None)
+
+
+def invalidate_card(profile_id):
+    """Drop a profile's cached swipe card"""
+    cache.delete(CARD_KEY.format(profile_id=profile_id))
+
+
+def get_pool(university_id, year):
+    """
+    Get the candidate pool for a university and year.
+
+    Returns a dict with ``ids`` (profile ids in primary-key order), the same
+    ids as a sorted numpy ``id_array`` for position lookups, and
+    ``features`` (their ranking feature rows, see ``matching.ranking``).
+    """
+    import numpy as np
+    from matching.ranking import feature_matrix
+    key = POOL_KEY.format(
+        university_id=university_id,
+        year=year,
+        version=pool_version(university_id)
+    )
+    pool = cache.get(key)
+    if pool is None:
+        rows = UserProfile.objects.filter(
+            year=year,
+            user__university_id=university_id,
+            user__is_active=True
+        ).order_by('pk').values_list('pk', 'hobbies', 'interests')
+        ids, tokens = [], []
+        for profile_id, hobbies, interests in rows.iterator(chunk_size=2000):
+            ids.append(profile_id)
+            tokens.append(profile_tokens(hobbies, interests))
+        pool = {
+            'ids': ids,
+            'id_array': np.array(ids, dtype=np.int64),
+            'features': feature_matrix(tokens)
+        }
+        cache.set(key, pool, settings.SWIPE_POOL_CACHE_TIMEOUT)
+    return pool
+
+
+def pool_positions(pool, profile_ids):
+    """Get the row positions of ``profile_ids`` in a pool, -1 for ids that are not in it"""
+    import numpy as np
+    pool_ids = pool['id_array']
+    profile_ids = np.asarray(profile_ids, dtype=np.int64)
+    if not len(pool_ids):
+        return np.full(len(profile_ids), -1)
+    positions = np.minimum(np.searchsorted(pool_ids, profile_ids), len(pool_ids) - 1)
+    return np.where(pool_ids[positions] == profile_ids, positions, -1)
+
+
+def get_cards(profile_ids):
+    """Get pre-rendered swipe cards by profile id, rendering any that are missing"""
+    keys = {CARD_KEY.format(profile_id=pk): pk for pk in profile_ids}
+    cards = {keys[key]: card for key, card in cache.get_many(keys).items()}
+
+    missing = [pk for pk in profile_ids if pk not in cards]
+    if missing:
+        rendered = {
+            profile.pk: dict(SwipeProfileSerializer(profile).data)
+            for profile in UserProfile.objects.filter(pk__in=missing)
+        }
+        cache.set_many(
+            {CARD_KEY.format(profile_id=pk): card for pk, card in rendered.items()},
+            settings.SWIPE_CARD_CACHE_TIMEOUT
+        )
+        cards.update(rendered)
+    return cards
@@ -59,6 +59,7 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
 
 class SwipeProfileSerializer(serializers.ModelSerializer):
     """Serializer for profiles shown in swiping (limited info)"""
+    id = serializers.IntegerField(source='pk', read_only=True)
     ai_summary = serializers.SerializerMethodField()
     
     class Meta:
@@ -0,0 +1,83 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import User
+from .models import ProfilePicture, UserProfile
+from .pools import invalidate_card, invalidate_pool
+from .tags import sync_profile_tags
+
+# Fields that decide which pool a profile is in, or its features there
+PROFILE_POOL_FIELDS = ('year', 'hobbies', 'interests')
+USER_POOL_FIELDS = ('university_id', 'is_active')
+
+
+def _invalidate_university(profile_id):
+    university_id = User.objects.filter(pk=profile_id).values_list('university_id', flat=True).first()
+    if university_id is not None:
+        invalidate_pool(university_id)
+
+
+def _remember_pool_fields(instance, fields):
+    # Deferred fields are left out rather than loaded
+    instance._loaded_pool_fields = {
+        field: instance.__dict__[field] for field in fields if field in instance.__dict__
+    }
+
+
+def _pool_fields_changed(instance, fields):
+    loaded = instance._loaded_pool_fields
+    return any(
+        field not in loaded or instance.__dict__[field] != loaded[field]
+        for field in fields if field in instance.__dict__
+    )
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_pool_fields(sender, instance, **kwargs):
+    _remember_pool_fields(instance, PROFILE_POOL_FIELDS)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_saved_profile(sender, instance, created, **kwargs):
+    """Drop a saved profile's card, and its university's pools if its place or features in them changed"""
+    invalidate_card(instance.pk)
+    if created or _pool_fields_changed(instance, PROFILE_POOL_FIELDS):
+        _invalidate_university(instance.pk)
+    _remember_pool_fields(instance, PROFILE_POOL_FIELDS)
+
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    """Drop a deleted profile's card and every pool of its university"""
+    invalidate_card(instance.pk)
+    _invalidate_university(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def index_profile_tags(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Keep the tag index in step with a saved profile's hobbies and interests"""
+    if raw or (update_fields is not None and not {'hobbies', 'interests'} & set(update_fields)):
+        return
+    sync_profile_tags(instance)
+
+
+@receiver(post_init, sender=User)
+def remember_user_pool_fields(sender, instance, **kwargs):
+    _remember_pool_fields(instance, USER_POOL_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_moved_user(sender, instance, created, **kwargs):
+    """A user who changes university or is (de)activated leaves one pool and joins another"""
+    if not created and _pool_fields_changed(instance, USER_POOL_FIELDS):
+        university_ids = {instance._loaded_pool_fields.get('university_id'), instance.university_id}
+        for university_id in university_ids - {None}:
+            invalidate_pool(university_id)
+    _remember_pool_fields(instance, USER_POOL_FIELDS)
+
+
+@receiver([post_save, post_delete], sender=ProfilePicture)
+def invalidate_profile_pictures(sender, instance, **kwargs):
+    """Match details show pictures, and their ETags follow the profile's ``updated_at``"""
+    UserProfile.objects.filter(pk=instance.profile_id).update(updated_at=timezone.now())
@@ -0,0 +1,99 @@
+"""
+Interest/hobby tag index.
+
+Free-text ``hobbies`` and ``interests`` are normalized into ``InterestTag``
+rows, and ``ProfileTag`` acts as an inverted index from each tag to the
+profiles that mention it. Candidate retrieval can then union or intersect
+posting lists instead of scanning every profile's text. Every profile save
+updates the index (``profiles.signals``); bulk writes, which skip signals,
+are followed by ``rebuild_profile_tags``.
+"""
+import re
+
+from django.db.models import Count
+
+from .models import InterestTag, ProfileTag
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['+#-][a-z0-9]+)*")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from',
+    'i', 'im', 'in', 'into', 'is', 'it', 'its', 'like', 'love', 'me', 'my',
+    'of', 'on', 'or', 'so', 'the', 'to', 'very', 'with',
+}
+
+MAX_TAG_LENGTH = 50
+
+
+def tokenize(text):
+    """Split free text into lowercase tags, dropping stopwords"""
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if 1 < len(token) <= MAX_TAG_LENGTH and token not in STOPWORDS
+    ]
+
+
+def profile_tokens(hobbies, interests):
+    """Get the set of tags describing a profile, regardless of source"""
+    return set(tokenize(hobbies)) | set(tokenize(interests))
+
+
+def profile_tag_pairs(hobbies, interests):
+    """Get the set of (tag, source) pairs a profile's text should be indexed under"""
+    return (
+        {(tag, 'hobby') for tag in tokenize(hobbies)}
+        | {(tag, 'interest') for tag in tokenize(interests)}
+    )
+
+
+def get_tag_ids(names):
+    """Map tag names to ids, creating any tags that don't exist yet"""
+    names = set(names)
+    if not names:
+        return {}
+    InterestTag.objects.bulk_create(
+        [InterestTag(name=name) for name in names],
+        ignore_conflicts=True
+    )
+    return dict(InterestTag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def sync_profile_tags(profile):
+    """Apply the difference between a profile's text and its index entries"""
+    wanted = profile_tag_pairs(profile.hobbies, profile.interests)
+    existing = {
+        (name, source): pk
+        for pk, name, source in ProfileTag.objects.filter(profile=profile).values_list(
+            'id', 'tag__name', 'source'
+        )
+    }
+
+    stale = [pk for pair, pk in existing.items() if pair not in wanted]
+    if stale:
+        ProfileTag.objects.filter(id__in=stale).delete()
+
+    missing = wanted - existing.keys()
+    if missing:
+        tag_ids = get_tag_ids(name for name, _ in missing)
+        ProfileTag.objects.bulk_create(
+            [
+                ProfileTag(tag_id=tag_ids[name], profile=profile, source=source)
+                for name, source in missing
+            ],
+            ignore_conflicts=True
+        )
+
+
+def profiles_with_any_tag(tags):
+    """Union of posting lists: ids of profiles mentioning at least one tag"""
+    return ProfileTag.objects.filter(tag__name__in=set(tags)).values_list('profile_id', flat=True).distinct()
+
+
+def profiles_with_all_tags(tags):
+    """Intersection of posting lists: ids of profiles mentioning every tag"""
+    tags = set(tags)
+    return ProfileTag.objects.filter(tag__name__in=tags).values('profile_id').annotate(
+        matched=Count('tag', distinct=True)
+    ).filter(matched=len(tags)).values_list('profile_id', flat=True)
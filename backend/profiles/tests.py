@@ -0,0 +1,121 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import University, User
+from .models import UserProfile
+from .pools import CARD_KEY, get_cards, get_pool, pool_version
+from .tags import profiles_with_any_tag
+
+
+class ProfileTagIndexTests(TestCase):
+    """Profiles saved anywhere, not just through the API, are indexed"""
+
+    def setUp(self):
+        university = University.objects.create(name='Test University', domain='test.edu')
+        self.user = User.objects.create(
+            username='user@test.edu', university_email='user@test.edu', university=university
+        )
+
+    def tagged(self, *tags):
+        return list(profiles_with_any_tag(tags))
+
+    def test_create_and_save(self):
+        profile = UserProfile.objects.create(
+            user=self.user,
+            full_name='Alice',
+            preferred_name='Alice',
+            year='junior',
+            hobbies='hiking, chess',
+            interests='coding'
+        )
+        self.assertEqual(self.tagged('chess', 'coding'), [profile.pk])
+
+        profile.hobbies = 'climbing'
+        profile.save()
+        self.assertEqual(self.tagged('chess'), [])
+        self.assertEqual(self.tagged('climbing'), [profile.pk])
+
+        # Saves that leave the text alone don't touch the index
+        profile.interests = 'painting'
+        profile.save(update_fields=['preferred_name'])
+        self.assertEqual(self.tagged('coding'), [profile.pk])
+
+
+class PoolInvalidationTests(TestCase):
+    """Pools are only rebuilt when a change can move a profile in or out of them or change its features"""
+
+    def setUp(self):
+        self.university = University.objects.create(name='Test University', domain='test.edu')
+        self.other = University.objects.create(name='Other University', domain='other.edu')
+        User.objects.bulk_create([
+            User(username=f'user{i}@test.edu', university_email=f'user{i}@test.edu', university=self.university)
+            for i in range(5)
+        ])
+        self.users = list(User.objects.order_by('id'))
+        for user in self.users:
+            UserProfile.objects.create(
+                user=user,
+                full_name=user.username,
+                preferred_name=user.username,
+                year='junior',
+                hobbies='hiking',
+                interests='coding'
+            )
+        self.profile = UserProfile.objects.get(pk=self.users[0].pk)
+
+    def pool_ids(self, university):
+        return get_pool(university.id, 'junior')['ids']
+
+    def test_card_only_edit(self):
+        version = pool_version(self.university.id)
+        get_cards([self.profile.pk])
+        self.profile.preferred_name = 'Alice'
+        self.profile.save()
+        self.assertEqual(pool_version(self.university.id), version)
+        self.assertIsNone(cache.get(CARD_KEY.format(profile_id=self.profile.pk)))
+        self.assertEqual(get_cards([self.profile.pk])[self.profile.pk]['preferred_name'], 'Alice')
+
+    def test_feature_edit(self):
+        version = pool_version(self.university.id)
+        self.profile.hobbies = 'chess'
+        self.profile.save()
+        self.assertNotEqual(pool_version(self.university.id), version)
+
+    def test_user_moves_university(self):
+        self.assertIn(self.profile.pk, self.pool_ids(self.university))
+        self.assertNotIn(self.profile.pk, self.pool_ids(self.other))
+        user = User.objects.get(pk=self.profile.pk)
+        user.university = self.other
+        user.save()
+        self.assertNotIn(self.profile.pk, self.pool_ids(self.university))
+        self.assertIn(self.profile.pk, self.pool_ids(self.other))
+
+    def test_user_deactivated(self):
+        self.assertIn(self.profile.pk, self.pool_ids(self.university))
+        user = User.objects.get(pk=self.profile.pk)
+        user.is_active = False
+        user.save()
+        self.assertNotIn(self.profile.pk, self.pool_ids(self.university))
+
+    def test_login_keeps_pools(self):
+        version = pool_version(self.university.id)
+        user = User.objects.get(pk=self.profile.pk)
+        user.save(update_fields=['last_login'])
+        self.assertEqual(pool_version(self.university.id), version)
+
+    def test_swipe_profiles_pages(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        ids = []
+        params = {'page_size': 3}
+        while True:
+            response = client.get('/api/profiles/swipe-profiles/', params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 3)
+            ids += [card['id'] for card in page['results']]
+            if page['next_cursor'] is None:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(ids, [user.id for user in self.users[1:]])
@@ -1,14 +1,19 @@
+from bisect import bisect_right
+from itertools import islice
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from matching.seen import load_seen
 from .models import UserProfile, ProfilePicture
+from .pools import get_cards, get_pool
 from .serializers import (
     UserProfileSerializer,
     UserProfileCreateSerializer,
     UserProfileUpdateSerializer,
-    SwipeProfileSerializer,
     ProfilePictureSerializer,
     ProfilePictureUploadSerializer
 )
@@ -50,7 +55,7 @@ def create_profile(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_swipe_profiles(request):
-    """Get profiles for swiping (limited info)"""
+    """Get one page of profiles for swiping (limited info), after the ``cursor`` profile id"""
     # Get current user's profile
     try:
         current_profile = request.user.profile
@@ -59,16 +64,39 @@ def get_swipe_profiles(request):
             'error': 'Profile not found. Please create your profile first.'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # Get profiles to show (same year, exclude current user)
-    profiles = UserProfile.objects.filter(
-        year=current_profile.year
-    ).exclude(user=request.user)
+    try:
+        page_size = int(request.query_params.get('page_size', settings.SWIPE_DECK_PAGE_SIZE))
+    except ValueError:
+        page_size = 0
+    if not 1 <= page_size <= settings.SWIPE_DECK_MAX_PAGE_SIZE:
+        return Response({
+            'error': f'page_size must be between 1 and {settings.SWIPE_DECK_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    # TODO: Add logic to exclude already swiped profiles
-    # This would require checking the Swipe model
+    try:
+        after = int(request.query_params.get('cursor', 0))
+    except ValueError:
+        return Response({
+            'error': 'Invalid cursor'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = SwipeProfileSerializer(profiles, many=True)
-    return Response(serializer.data)
+    # Get profiles to show (same university and year, excluding current user and already swiped users)
+    seen = load_seen(request.user.id)
+    pool = get_pool(request.user.university_id, current_profile.year)
+    profile_ids = []
+    next_cursor = None
+    for profile_id in islice(pool['ids'], bisect_right(pool['ids'], after), None):
+        if profile_id == request.user.id or profile_id in seen:
+            continue
+        if len(profile_ids) == page_size:
+            next_cursor = str(profile_ids[-1])
+            break
+        profile_ids.append(profile_id)
+    cards = get_cards(profile_ids)
+    return Response({
+        'next_cursor': next_cursor,
+        'results': [cards[profile_id] for profile_id in profile_ids if profile_id in cards]
+    })
 
 
 @api_view(['POST'])